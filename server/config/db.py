@@ -10,6 +10,9 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL environment variable is not set")
 
+# Optional read replica for endpoints that only query
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -21,3 +24,21 @@ def get_db():
         yield db
     finally:
         db.close()
+
+if DATABASE_READ_URL:
+    read_engine = create_engine(DATABASE_READ_URL)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+    def get_read_db():
+        """
+        Session on the read replica. Only use it for queries: the replica
+        may lag behind writes made through get_db.
+        """
+        db = ReadSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+else:
+    # No replica: reads share the request's primary session
+    read_engine, ReadSessionLocal, get_read_db = engine, SessionLocal, get_db
@@ -3,8 +3,36 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     SECRET_KEY: str
     DATABASE_URL: str
+    DATABASE_READ_URL: str = ""  # optional read replica (read by config/db.py)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60  # Optional default
 
+    # CPU thread budgets (0 = use every core).
+    API_THREADS: int = 4  # everything the API process runs, in total
+    TRAIN_THREADS: int = 4
+    PREDICT_THREADS: int = 1
+    TF_INTRA_OP_THREADS: int = 0  # 0 = the process's own budget
+    TF_INTER_OP_THREADS: int = 1
+
+    # Per-job training budgets (0 = unlimited).
+    TRAIN_TIME_LIMIT_SECONDS: int = 900
+    TRAIN_MEMORY_LIMIT_MB: int = 4096
+
+    # Model artifact storage ("local" or "s3") and the per-node read cache.
+    STORAGE_BACKEND: str = "local"
+    S3_BUCKET: str = ""
+    S3_PREFIX: str = "models/"
+    S3_ENDPOINT_URL: str = ""  # e.g. a local MinIO stand-in
+    ARTIFACT_CACHE_DIR: str = ".artifact_cache"
+    ARTIFACT_CACHE_MAX_MB: int = 2048
+    ARTIFACT_PREFETCH_WORKERS: int = 4
+    PREFETCH_RECENT_MODELS: int = 0  # models to warm into the cache on startup
+
+    # Dedicated inference worker processes (0 = predict inside the API process).
+    INFERENCE_WORKERS: int = 0
+    INFERENCE_REPLICAS_PER_MODEL: int = 0  # workers serving each model (0 = all)
+    INFERENCE_TIMEOUT_SECONDS: int = 30
+    INFERENCE_LOAD_TIMEOUT_SECONDS: int = 300  # first load of a model into a worker
+
     class Config:
         env_file = ".env"
 
@@ -12,3 +40,56 @@ settings = Settings()
 
 SAVED_MODELS_DIR = "saved_models" # directory where models will be saved after training.
 MAX_BATCH_SIZE = 500 # sets the maximum number of samples that can be accepted as input for prediction.
+NN_BATCH_BUCKETS = (1, 8, 32, 128, 512) # padded batch sizes for the compiled neural net serving function.
+NN_JIT_COMPILE = True # XLA-compile the neural net serving function (falls back to graph mode if that fails).
+NN_EXPORT_TFLITE = False # also export a .tflite copy of neural nets for the lighter CPU runtime.
+ONNX_EXPORT = False # also export an .onnx copy of every model, kept only if it matches the native model (adds conversion time to every save).
+ONNX_SERVING = True # serve models through onnxruntime when they have an .onnx copy.
+ONNX_PARITY_ROWS = 32 # rows compared between the native and ONNX model on export and load.
+ONNX_PARITY_TOLERANCE = 1e-4 # largest probability difference accepted by the parity check.
+PREPROCESS_SPARSE_MIN_COLUMNS = 256 # one-hot widths above this are kept as sparse matrices.
+MAX_N_ESTIMATORS = 2000 # upper bound on n_estimators accepted for random forests.
+EVAL_CALIBRATION_BINS = 10 # confidence bins in the holdout calibration report.
+PREVIEW_FRACTIONS = (0.01, 0.05, 0.2) # training-set fractions fitted by /fit/ preview mode.
+PREVIEW_MIN_ROWS = 50 # smallest subsample a preview fit is run on.
+PREVIEW_TIME_LIMIT_SECONDS = 30 # total time budget for a preview run.
+COMPACT_TREE_FRACTIONS = (1.0, 0.5, 0.25, 0.1, 0.05) # share of a forest's trees kept by compaction candidates.
+COMPACT_MAX_DEPTHS = (20, 14, 10, 7, 5) # tree depth limits tried by compaction.
+COMPACT_NN_QUANTIZATIONS = ("float32", "float16", "dynamic", "int8") # TFLite variants tried for neural nets.
+COMPACT_BENCHMARK_ROWS = 100 # rows per timed prediction call when benchmarking compacted models.
+COMPACT_BENCHMARK_REPEATS = 5 # timed calls per candidate (the median is reported).
+METADATA_CACHE_SECONDS = 5 # how long metadata responses are cached (writes in this process clear them).
+METADATA_CACHE_MAX_ENTRIES = 1024 # cached metadata responses kept per process.
+MULTI_SCORE_MAX_MODELS = 10 # models one /predict-file-multi/ request may score.
+MULTI_SCORE_CACHED_MODELS = 8 # models kept loaded in the API process for multi-model scoring.
+SHADOW_SAMPLE_RATE = 0.1 # default share of prediction requests also scored by a shadow candidate.
+SHADOW_QUEUE_SIZE = 64 # sampled requests waiting for the candidate; more are dropped.
+SHADOW_LATENCY_WINDOW = 1000 # recent shadowed requests kept for latency percentiles.
+INFERENCE_MODELS_PER_WORKER = 4 # loaded models each inference worker keeps in memory.
+INFERENCE_HEALTH_INTERVAL = 5 # seconds between inference worker health checks.
+
+# Admission control (per worker process). Rate limits are (requests per second, burst) per user, by role.
+RATE_LIMITS = {
+    "user": {"predict": (10.0, 30), "train": (0.05, 3)},
+    "admin": {"predict": (50.0, 150), "train": (0.5, 10)},
+}
+FAIR_SHARE_WEIGHTS = {"user": 1.0, "admin": 2.0} # relative share of queued work per role.
+WORKLOAD_CONCURRENCY = {"predict": 4, "train": 1} # requests of each kind run at once.
+MAX_QUEUE_LENGTH = 64 # requests waiting per workload before load is shed with 429.
+MAX_QUEUED_PER_USER = 8 # requests a single user may have waiting per workload.
+
+# Training job queue (see training_worker.py).
+JOB_POLL_SECONDS = 2 # how often an idle training worker checks for new jobs.
+JOB_HEARTBEAT_SECONDS = 10 # how often a running job's heartbeat is refreshed.
+JOB_STALE_SECONDS = 120 # running jobs without a heartbeat for this long are requeued.
+JOB_MAX_ATTEMPTS = 3 # attempts before a job is marked failed.
+JOB_RETRY_BACKOFF_SECONDS = 30 # delay before a failed attempt is retried (doubles each attempt).
+
+# Resumable uploads (see routes/uploads.py).
+UPLOAD_DIR = "uploads" # directory where resumable uploads are assembled.
+UPLOAD_CHUNK_SIZE_MB = 8 # chunk size suggested to clients when an upload is initiated.
+UPLOAD_MAX_CHUNK_MB = 64 # larger chunks are rejected.
+UPLOAD_WRITE_BUFFER_KB = 1024 # chunk bytes collected before each (threadpool) write to disk.
+UPLOAD_EXPIRE_HOURS = 24 # uploads untouched for this long are removed.
+UPLOAD_SWEEP_INTERVAL = 600 # seconds between sweeps for expired uploads.
+UPLOAD_CACHED_DATASETS = 2 # parsed, finalized uploads kept in memory for /fit/.
@@ -1,7 +1,16 @@
+from sqlalchemy import inspect, text
 from config.db import Base, engine
 from models.user import User
 from models.trained_model import TrainedModel
+from models.training_job import TrainingJob
 
 print("Creating database tables...")
 Base.metadata.create_all(bind=engine)
-print("Tables created.")
\ No newline at end of file
+
+# create_all does not alter existing tables; add columns introduced since they were created
+existing = {c["name"] for c in inspect(engine).get_columns("trained_models")}
+if "metrics" not in existing:
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE trained_models ADD COLUMN metrics JSON"))
+    print("Added trained_models.metrics column.")
+print("Tables created.")
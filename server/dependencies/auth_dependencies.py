@@ -18,6 +18,8 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    # Always the primary: a lagging replica could still show a deleted user
+    # or a revoked admin role
     user = db.query(User).filter(User.id == int(user_id)).first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
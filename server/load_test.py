@@ -0,0 +1,314 @@
+"""
+In-process load test for the API. Runs the FastAPI app against a throwaway
+SQLite database, seeds users and models from data/heart_disease.csv, then
+drives a concurrent mix of login, predict, predict-file and fit requests and
+reports throughput, latency percentiles and error rates per endpoint.
+
+    python load_test.py --concurrency 32 --duration 30 \\
+        --mix login=1,predict=6,predict_file=2,fit=1
+
+Requests go through httpx's ASGI transport on one event loop, so anything
+that blocks the loop shows up as latency on every endpoint (and in the
+reported event loop lag). Pass --max-error-rate / --max-p95-ms /
+--max-loop-lag-ms to exit non-zero when a threshold is crossed (for CI).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA = os.path.join(SERVER_DIR, "..", "data", "heart_disease.csv")
+ENDPOINTS = ("login", "predict", "predict_file", "fit")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="In-process load test for the API.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent virtual users.")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run the mix for.")
+    parser.add_argument("--mix", default="login=1,predict=6,predict_file=2,fit=1",
+                        help="Relative weights of each endpoint, e.g. predict=8,fit=1.")
+    parser.add_argument("--users", type=int, default=8, help="Users to seed.")
+    parser.add_argument("--role", choices=("user", "admin"), default="user",
+                        help="Role of seeded users (admins have higher rate limits).")
+    parser.add_argument("--rows", type=int, default=20, help="Rows per predict / predict-file request.")
+    parser.add_argument("--fit-models", default="logisticregression,randomforest",
+                        help="Model types used by fit requests.")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="CSV used for seeding and requests.")
+    parser.add_argument("--target", default="target", help="Target column of --data.")
+    parser.add_argument("--workdir", default=None, help="Directory for the SQLite DB and artifacts (default: temp).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the report as JSON.")
+    parser.add_argument("--max-error-rate", type=float, default=None, help="Fail if any endpoint's error rate is higher.")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="Fail if any endpoint's p95 latency is higher.")
+    parser.add_argument("--max-loop-lag-ms", type=float, default=None, help="Fail if the event loop stalled for longer.")
+    return parser.parse_args()
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in --mix: {name} (expected one of {', '.join(ENDPOINTS)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def setup_environment(workdir: str) -> None:
+    """
+    Point the app at a SQLite database and local artifact storage inside
+    `workdir`. Must run before any server module is imported.
+    """
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'load_test.db')}"
+    os.environ.setdefault("SECRET_KEY", "load-test-secret")
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.chdir(workdir)  # saved_models/ and the artifact cache are relative paths
+    sys.path.insert(0, SERVER_DIR)
+
+
+def seed(args, df):
+    """
+    Create tables, users and one saved model per fit model type. Returns
+    [(username, password)] and the name of the model to load.
+    """
+    from config.db import Base, engine, SessionLocal
+    from models.user import User
+    from models.trained_model import TrainedModel  # noqa: F401 (registers the table)
+    from models.training_job import TrainingJob  # noqa: F401
+    from services.auth import register_user
+    from services.trainer import train_model
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        users = []
+        for i in range(args.users):
+            username, password = f"load{i}", f"load-pass-{i}"
+            user = register_user(db, {
+                "username": username, "email": f"{username}@example.com", "name": username, "password": password,
+            })
+            if args.role == "admin":
+                user.role = "admin"
+                db.commit()
+            users.append((username, password))
+
+        owner = db.query(User).filter(User.username == users[0][0]).first()
+        X, y = df.drop(columns=[args.target]), df[args.target]
+        model_name = None
+        for model_type in args.fit_models.split(","):
+            model_name = f"seed_{model_type}"
+            train_model(
+                model_type=model_type, X=X, y=y, params=small_params(model_type), test_size=0.2,
+                k_fold=0, db=db, user_id=owner.id, file_name=model_name,
+            )
+        return users, model_name
+    finally:
+        db.close()
+
+
+def small_params(model_type: str) -> dict:
+    return {"n_estimators": 20} if model_type == "randomforest" else {}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.counts = defaultdict(lambda: {"ok": 0, "shed": 0, "error": 0})
+        self.errors = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, seconds: float, status, detail: str = "") -> None:
+        self.latencies[endpoint].append(seconds)
+        if status == 429:
+            self.counts[endpoint]["shed"] += 1
+        elif isinstance(status, int) and 200 <= status < 300:
+            self.counts[endpoint]["ok"] += 1
+        else:
+            self.counts[endpoint]["error"] += 1
+            self.errors[endpoint][f"{status} {detail}"[:120]] += 1
+
+    def report(self, elapsed: float, loop_lags: list) -> dict:
+        import numpy as np
+
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            counts = self.counts[endpoint]
+            total = sum(counts.values())
+            ms = np.array(latencies) * 1000
+            endpoints[endpoint] = {
+                "requests": total,
+                "throughput_rps": round(total / elapsed, 2),
+                "ok": counts["ok"],
+                "shed_429": counts["shed"],
+                "errors": counts["error"],
+                "error_rate": round(counts["error"] / total, 4),
+                "p50_ms": round(float(np.percentile(ms, 50)), 1),
+                "p95_ms": round(float(np.percentile(ms, 95)), 1),
+                "p99_ms": round(float(np.percentile(ms, 99)), 1),
+                "max_ms": round(float(ms.max()), 1),
+                "top_errors": dict(sorted(self.errors[endpoint].items(), key=lambda kv: -kv[1])[:5]),
+            }
+        lags = np.array(loop_lags or [0.0]) * 1000
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "total_requests": sum(e["requests"] for e in endpoints.values()),
+            "endpoints": endpoints,
+            "event_loop_lag_ms": {
+                "p99": round(float(np.percentile(lags, 99)), 1),
+                "max": round(float(lags.max()), 1),
+            },
+        }
+
+
+async def monitor_loop_lag(stop: asyncio.Event, lags: list, interval: float = 0.02) -> None:
+    """
+    Measure how late the event loop wakes a sleeping task. Long stalls mean
+    something is running synchronously on the loop.
+    """
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - start - interval))
+
+
+async def run(args) -> dict:
+    import httpx
+    import pandas as pd
+    import main
+
+    df = pd.read_csv(args.data)
+    users, model_name = seed(args, df)
+    features = df.drop(columns=[args.target])
+    csv_bytes = df.to_csv(index=False).encode()
+    weights = parse_mix(args.mix)
+    names, probabilities = list(weights), list(weights.values())
+    fit_models = args.fit_models.split(",")
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    tokens = {}
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+
+            async def login(username, password):
+                r = await client.post("/login", data={"username": username, "password": password})
+                if r.status_code == 200:
+                    tokens[username] = r.json()["access_token"]
+                return r
+
+            for username, password in users:
+                await login(username, password)
+            headers = {"Authorization": f"Bearer {tokens[users[0][0]]}"}
+            r = await client.post("/load-model/", data={"file_name": model_name}, headers=headers)
+            if r.status_code != 200:
+                raise SystemExit(f"Failed to load the seeded model: {r.text}")
+
+            async def one_request(endpoint: str):
+                username, password = rng.choice(users)
+                headers = {"Authorization": f"Bearer {tokens[username]}"}
+                sample = features.sample(args.rows, random_state=rng.randrange(2**31))
+                if endpoint == "login":
+                    return await login(username, password)
+                if endpoint == "predict":
+                    return await client.post("/predict/", json={"input_data": sample.values.tolist()}, headers=headers)
+                if endpoint == "predict_file":
+                    files = {"file": ("rows.csv", sample.to_csv(index=False).encode(), "text/csv")}
+                    return await client.post("/predict-file/", files=files, headers=headers)
+                model_type = rng.choice(fit_models)
+                data = {
+                    "model_type": model_type,
+                    "target": args.target,
+                    "file_name": f"load_{model_type}_{rng.randrange(10**9)}",
+                    "params": json.dumps(small_params(model_type)),
+                }
+                files = {"file": ("data.csv", csv_bytes, "text/csv")}
+                return await client.post("/fit/", data=data, files=files, headers=headers)
+
+            async def virtual_user(deadline: float):
+                while time.monotonic() < deadline:
+                    endpoint = rng.choices(names, probabilities)[0]
+                    started = time.monotonic()
+                    try:
+                        r = await one_request(endpoint)
+                        detail = "" if r.status_code < 300 else r.text[:100]
+                        recorder.record(endpoint, time.monotonic() - started, r.status_code, detail)
+                    except Exception as e:
+                        recorder.record(endpoint, time.monotonic() - started, type(e).__name__, str(e))
+
+            stop, lags = asyncio.Event(), []
+            monitor = asyncio.create_task(monitor_loop_lag(stop, lags))
+            started = time.monotonic()
+            deadline = started + args.duration
+            await asyncio.gather(*(virtual_user(deadline) for _ in range(args.concurrency)))
+            elapsed = time.monotonic() - started
+            stop.set()
+            await monitor
+
+    return recorder.report(elapsed, lags)
+
+
+def print_report(report: dict) -> None:
+    print(f"\n{report['total_requests']} requests in {report['elapsed_seconds']}s")
+    header = f"{'endpoint':<14}{'reqs':>7}{'rps':>9}{'err%':>8}{'429':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, e in report["endpoints"].items():
+        print(f"{name:<14}{e['requests']:>7}{e['throughput_rps']:>9}{e['error_rate'] * 100:>8.2f}{e['shed_429']:>6}"
+              f"{e['p50_ms']:>9}{e['p95_ms']:>9}{e['p99_ms']:>9}{e['max_ms']:>9}")
+    lag = report["event_loop_lag_ms"]
+    print(f"event loop lag: p99 {lag['p99']} ms, max {lag['max']} ms")
+    for name, e in report["endpoints"].items():
+        for error, count in e["top_errors"].items():
+            print(f"[WARN] {name}: {count}x {error}")
+
+
+def check_thresholds(args, report: dict) -> list:
+    failures = []
+    for name, e in report["endpoints"].items():
+        if args.max_error_rate is not None and e["error_rate"] > args.max_error_rate:
+            failures.append(f"{name} error rate {e['error_rate']} > {args.max_error_rate}")
+        if args.max_p95_ms is not None and e["p95_ms"] > args.max_p95_ms:
+            failures.append(f"{name} p95 {e['p95_ms']} ms > {args.max_p95_ms} ms")
+    lag = report["event_loop_lag_ms"]["max"]
+    if args.max_loop_lag_ms is not None and lag > args.max_loop_lag_ms:
+        failures.append(f"event loop lag {lag} ms > {args.max_loop_lag_ms} ms")
+    return failures
+
+
+def main():
+    args = parse_args()
+    args.data = os.path.abspath(args.data)
+    if args.json_path:
+        args.json_path = os.path.abspath(args.json_path)
+    parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = os.path.abspath(args.workdir or tmp)
+        os.makedirs(workdir, exist_ok=True)
+        if os.path.exists(os.path.join(workdir, "load_test.db")):
+            os.remove(os.path.join(workdir, "load_test.db"))
+        setup_environment(workdir)
+        report = asyncio.run(run(args))
+        os.chdir(SERVER_DIR)
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = check_thresholds(args, report)
+    for failure in failures:
+        print(f"[ERROR] {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,51 @@
-from fastapi import FastAPI, UploadFile, File, Form, Query, Depends, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, Query, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from schemas.request_response import PredictRequest
-from services.trainer import train_model, make_prediction
-from services.trainer import load_model_from_disk
+from services.trainer import train_model, preview_model, make_prediction
+from services.trainer import load_model_from_disk, artifact_keys
+from services.storage import storage, artifact_cache
+from services.admission import admission
+from services.scoring import score_models
+from services.uploads import load_upload_dataset, start_upload_sweeper, stop_upload_sweeper
+from services.compaction import compact_model, resolve_compact_name
+from services.shadow import shadow
+from services.metadata_cache import metadata_cache
+from services import inference_pool as pool
+from sqlalchemy import or_
 from utils.data import load_csv_data
+from utils import wire
 from models.trained_model import TrainedModel
 import json
 import os
-from config.settings import SAVED_MODELS_DIR, MAX_BATCH_SIZE
-from config.db import SessionLocal, get_db
+import time
+from config.settings import settings, SAVED_MODELS_DIR, MAX_BATCH_SIZE, MULTI_SCORE_MAX_MODELS, COMPACT_BENCHMARK_ROWS
+from config.db import SessionLocal, get_db, get_read_db, read_engine, engine
 from routes import auth
 from routes.auth import router as auth_router
 from dependencies.auth_dependencies import get_current_user
 from models.user import User
 from fastapi.openapi.utils import get_openapi
 import re
-from typing import Any
+from typing import Any, Optional
 from datetime import datetime
 from routes.admin import router as admin_router
+from routes.jobs import router as jobs_router
+from routes.uploads import router as uploads_router
+from routes.shadow import router as shadow_router
+from utils.threads import configure_api_threads, describe_thread_limits
 
-
+configure_api_threads()
 
 app = FastAPI()
 app.include_router(auth_router, tags=["Auth"])
 app.include_router(admin_router)
+app.include_router(jobs_router)
+app.include_router(uploads_router)
+app.include_router(shadow_router)
 
 # Enable CORS (for frontend access)
 app.add_middleware(
@@ -36,49 +56,108 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def report_thread_limits():
+    print(f"[INFO] Thread limits: {describe_thread_limits()}")
+
+@app.on_event("startup")
+def start_inference_workers():
+    if pool.start_inference_pool() is not None:
+        print(f"[INFO] Inference workers: {pool.inference_pool.status()}")
+
+@app.on_event("shutdown")
+def stop_inference_workers():
+    pool.stop_inference_pool()
+
+@app.on_event("startup")
+def start_upload_cleanup():
+    start_upload_sweeper()
+
+@app.on_event("shutdown")
+def stop_upload_cleanup():
+    stop_upload_sweeper()
+
+@app.on_event("startup")
+def prefetch_recent_models():
+    if settings.PREFETCH_RECENT_MODELS <= 0:
+        return
+    db = SessionLocal()
+    try:
+        recent = db.query(TrainedModel).order_by(TrainedModel.created_at.desc()) \
+            .limit(settings.PREFETCH_RECENT_MODELS).all()
+        keys = [key for m in recent for key in artifact_keys(m.file_path)]
+    finally:
+        db.close()
+    print(f"[INFO] Prefetched {len(artifact_cache.prefetch(keys))} artifact(s) into the local cache")
+
 # In-memory storage (for demo purposes)
 trained_model = None
 current_model_name = None
+current_model_key = None     # storage key of the loaded model (used by inference workers)
+current_model_digest = None
 target_column = None
 
 
 @app.post("/fit/", tags=["Training"])
 async def fit_model(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    upload_id: str = Form(""),      # finalized resumable upload, instead of `file`
     model_type: str = Form(...),    
     file_name: str = Form(""),      # Optional custom name
     target: str = Form(...),        
     test_size: float = Form(0.2),
     k_folds: int = Form(0),         # 0 = no K-Fold CV
     params: str = Form("{}"),       
+    preview: bool = Form(False),    # quick fit on subsamples, see below
+    save_preview: bool = Form(False),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Train a machine learning model using uploaded CSV data.
+    Train a machine learning model using uploaded CSV data (plain, gzip/zstd-compressed, or Parquet).
 
     Supports Logistic Regression, Random Forest, and a simple Neural Net.
     Allows for custom hyperparameters, train/test split, and optional K-Fold validation.
+
+    With `preview=true`, the model is instead fitted on stratified subsamples of
+    increasing size within a fixed time budget, returning each subsample's
+    accuracy and a learning-curve estimate of full-data accuracy. Nothing is
+    saved unless `save_preview=true`.
+
+    Instead of `file`, `upload_id` can name a finalized resumable upload (see /uploads/).
     
     Returns:
-    - Training accuracy
+    - Holdout (or cross-validated) accuracy
     - Saved model file name
+    - Training info (epochs/trees/iterations run, early stopping, budget hits)
+    - Metrics report: confusion matrix, per-class precision/recall/F1,
+      ROC-AUC and calibration bins (also stored with the model)
     """
 
     global trained_model, current_model_name, current_model_type, target_column
+    global current_model_key, current_model_digest
+
+    admission.check_rate("train", current_user)
 
     # Generate default file_name if not provided
     if not file_name:
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
         file_name = f"{model_type}_{current_user.id}_{timestamp}"
 
-    df = await load_csv_data(file)
+    try:
+        if upload_id:
+            df = await run_in_threadpool(load_upload_dataset, upload_id, current_user)
+        elif file is not None:
+            df = await load_csv_data(file)
+        else:
+            raise ValueError("Provide either a file or an upload_id.")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
     if target not in df.columns:
         raise HTTPException(status_code=400, detail=f"Target column '{target}' not found in dataset.")
 
-    target_column = target
-    current_model_name = file_name
-
     X = df.drop(columns=[target])
     y = df[target]
 
@@ -87,19 +166,59 @@ async def fit_model(
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON in 'params'")
 
+    if preview:
+        try:
+            async with admission.slot("train", current_user):
+                preview_instance, preview_result, saved_file_name = await run_in_threadpool(
+                    preview_model,
+                    model_type=model_type.strip().lower(),
+                    X=X,
+                    y=y,
+                    params=hyperparams,
+                    test_size=test_size,
+                    db=db,
+                    user_id=current_user.id,
+                    file_name=file_name,
+                    save=save_preview
+                )
+        except HTTPException:
+            raise
+        except ValueError as ve:
+            raise HTTPException(status_code=400, detail=str(ve))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Preview failed: {str(e)}")
+
+        if saved_file_name:
+            trained_model = preview_instance
+            target_column = target
+            current_model_name = file_name
+            current_model_type = model_type.strip().lower()
+            current_model_key = saved_file_name
+            current_model_digest = storage.digest(saved_file_name)
+        return {"preview": preview_result, "file_name": saved_file_name}
+
+    target_column = target
+    current_model_name = file_name
+
     try:
-        trained_model, acc, saved_file_name = train_model(
-            model_type=model_type.strip().lower(),
-            X=X,
-            y=y,
-            params=hyperparams,
-            test_size=test_size,
-            k_fold=k_folds,
-            db=db,
-            user_id=current_user.id,
-            file_name=file_name
-        )
+        async with admission.slot("train", current_user):
+            trained_model, acc, saved_file_name = await run_in_threadpool(
+                train_model,
+                model_type=model_type.strip().lower(),
+                X=X,
+                y=y,
+                params=hyperparams,
+                test_size=test_size,
+                k_fold=k_folds,
+                db=db,
+                user_id=current_user.id,
+                file_name=file_name
+            )
         current_model_type = model_type.strip().lower()
+        current_model_key = saved_file_name
+        current_model_digest = storage.digest(saved_file_name)
+    except HTTPException:
+        raise
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
@@ -107,44 +226,76 @@ async def fit_model(
 
     return {
         "accuracy": acc,
-        "file_name": saved_file_name
+        "file_name": saved_file_name,
+        "training_info": trained_model.training_info,
+        "metrics": trained_model.evaluation
     }
 
 
-@app.post("/predict/", tags=["Prediction"])
-def predict(
-    request: PredictRequest,
+_BINARY_BODY = {"schema": {"type": "string", "format": "binary"}}
+
+@app.post("/predict/", tags=["Prediction"], openapi_extra={
+    "requestBody": {
+        "required": True,
+        "content": {
+            wire.JSON: {"schema": PredictRequest.model_json_schema()},
+            wire.ARROW: _BINARY_BODY,
+            wire.NPY: _BINARY_BODY,
+            wire.MSGPACK: _BINARY_BODY,
+        },
+    }
+})
+async def predict(
+    request: Request,
+    return_proba: bool = Query(False, description="Return class probabilities (binary request bodies only)"),
     current_user: User = Depends(get_current_user)
 ):
-    ensure_model_loaded()
-
-    if len(request.input_data) > MAX_BATCH_SIZE:
-        raise HTTPException(status_code=400, detail=f"Batch too large. Max allowed is {MAX_BATCH_SIZE} samples.")
+    """
+    Predict with input samples.
 
-    prediction = make_prediction(
-        trained_model, current_model_type, request.input_data, request.return_proba
-    )
+    The body is JSON (`PredictRequest`), or a 2D feature array as Arrow IPC,
+    `.npy` or msgpack, selected by `Content-Type`. The response format follows
+    `Accept` (JSON by default) and is compressed when `Accept-Encoding`
+    allows zstd or gzip.
+    """
+    ensure_model_loaded()
+    admission.check_rate("predict", current_user)
 
-    if request.return_proba:
-        return {
-            "file_name": current_model_name,
-            "probabilities": [
-                {"index": i, "scores": row} for i, row in enumerate(prediction)
-            ]
-        }
+    kind = wire.media_type(request.headers.get("content-type"))
+    body = await request.body()
 
-    return {
-        "file_name": current_model_name,
-        "predictions": [
-            {"index": i, "value": val} for i, val in enumerate(prediction)
-        ]
-    }
+    if kind == wire.JSON:
+        try:
+            payload = PredictRequest.model_validate_json(body)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=json.loads(e.json()))
+        input_data, return_proba = payload.input_data, payload.return_proba
+    else:
+        input_data = wire.decode_array(body, kind)
 
+    if len(input_data) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch too large. Max allowed is {MAX_BATCH_SIZE} samples.")
 
+    try:
+        async with admission.slot("predict", current_user):
+            prediction = await run_in_threadpool(run_prediction, input_data, return_proba)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except pool.InferenceUnavailable as e:
+        raise inference_unavailable(e)
+
+    return wire.prediction_response(
+        prediction,
+        return_proba,
+        wire.negotiate(request.headers.get("accept")),
+        request.headers.get("accept-encoding"),
+        {"file_name": current_model_name},
+    )
 
 
 @app.post("/predict-file/", tags=["Prediction"])
 async def predict_from_file(
+    request: Request,
     file: UploadFile = File(...),
     return_proba: bool = False,
     current_user: User = Depends(get_current_user)
@@ -152,72 +303,136 @@ async def predict_from_file(
     """
     Predict using a trained model by uploading a CSV file with feature rows.
 
-    - The file should contain **only the feature columns** (no target column).
     - The **first row must include feature names** (i.e., the CSV must have a header row).
-    - Returns a list of predicted values or class probabilities.
+    - Columns are matched to the training features by name; extra columns (e.g. the target) are ignored.
+    - gzip/zstd-compressed CSV and Parquet are detected automatically.
+    - Arrow IPC (`.arrow`), `.npy` and msgpack uploads are also accepted.
+    - Returns a list of predicted values or class probabilities, in the format requested by `Accept`.
     """
 
     ensure_model_loaded()
-
-    df = await load_csv_data(file)
+    admission.check_rate("predict", current_user)
+
+    upload_kind = wire.media_type_for_upload(file.content_type, file.filename)
+    if upload_kind:
+        df = wire.decode_array(await file.read(), upload_kind)
+    else:
+        # Only parse the columns the model was trained on, when known
+        feature_names = getattr(getattr(trained_model, "preprocessor", None), "feature_names", None)
+        try:
+            df = await load_csv_data(file, feature_names)
+        except ValueError as ve:
+            raise HTTPException(status_code=400, detail=str(ve))
 
     if len(df) > MAX_BATCH_SIZE:
         raise HTTPException(status_code=400, detail=f"Batch too large. Max allowed is {MAX_BATCH_SIZE} rows.")
 
-    input_data = df.values.tolist()
-
-    prediction = make_prediction(
-        trained_model, current_model_type, input_data, return_proba
+    try:
+        async with admission.slot("predict", current_user):
+            prediction = await run_in_threadpool(run_prediction, df, return_proba)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except pool.InferenceUnavailable as e:
+        raise inference_unavailable(e)
+
+    return wire.prediction_response(
+        prediction,
+        return_proba,
+        wire.negotiate(request.headers.get("accept")),
+        request.headers.get("accept-encoding"),
+        {"file_name": current_model_name, "rows_predicted": len(prediction)},
     )
 
-    if return_proba:
-        return {
-            "file_name": current_model_name,
-            "probabilities": [
-                {"index": i, "scores": row} for i, row in enumerate(prediction)
-            ],
-            "rows_predicted": len(prediction)
-        }
+@app.post("/predict-file-multi/", tags=["Prediction"])
+async def predict_file_multi(
+    request: Request,
+    file: UploadFile = File(...),
+    model_names: str = Form(...),   # comma-separated TrainedModel names
+    return_proba: bool = Form(False),
+    ensemble: bool = Form(False),   # also return the soft-vote average of all models
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Score one uploaded file against several saved models in a single request.
 
-    return {
-        "file_name": current_model_name,
-        "predictions": [
-            {"index": i, "value": val} for i, val in enumerate(prediction)
-        ],
-        "rows_predicted": len(prediction)
-    }
+    The file is parsed once and the models run in parallel over the same input.
+    Returns predictions (and probabilities if requested) per model, plus an
+    optional soft-vote ensemble. Accepts the same file formats as /predict-file/.
+    """
+    names = list(dict.fromkeys(n.strip() for n in model_names.split(",") if n.strip()))
+    if not names:
+        raise HTTPException(status_code=400, detail="No model names given.")
+    if len(names) > MULTI_SCORE_MAX_MODELS:
+        raise HTTPException(status_code=400, detail=f"At most {MULTI_SCORE_MAX_MODELS} models can be scored at once.")
+
+    query = db.query(TrainedModel).filter(TrainedModel.name.in_(names))
+    if current_user.role != "admin":
+        query = query.filter(TrainedModel.user_id == current_user.id)
+    records = {m.name: m for m in query.order_by(TrainedModel.created_at).all()}  # latest wins
+    missing = [n for n in names if n not in records]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Model metadata not found in DB: {', '.join(missing)}")
+
+    admission.check_rate("predict", current_user)
+
+    upload_kind = wire.media_type_for_upload(file.content_type, file.filename)
+    try:
+        if upload_kind:
+            df = wire.decode_array(await file.read(), upload_kind)
+        else:
+            df = await load_csv_data(file)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+    if len(df) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch too large. Max allowed is {MAX_BATCH_SIZE} rows.")
+
+    try:
+        async with admission.slot("predict", current_user):
+            result = await run_in_threadpool(
+                score_models, [records[n] for n in names], df, return_proba, ensemble
+            )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except pool.InferenceUnavailable as e:
+        raise inference_unavailable(e)
+
+    return wire.json_response({"rows_predicted": len(df), **result}, request.headers.get("accept-encoding"))
 
 @app.get("/list-models/", tags=["Model Management"])
 def list_saved_models(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)):
 
-    if not os.path.exists(SAVED_MODELS_DIR):
-        return {"models": []}
+    is_admin = getattr(current_user, "role", None) == "admin"
 
-    try:
-        if getattr(current_user, "role", None) == "admin":
+    def query_models():
+        if is_admin:
             models = db.query(TrainedModel).all()
         else:
             models = db.query(TrainedModel).filter(TrainedModel.user_id == current_user.id).all()
+        return {
+            "models": [
+                {
+                    "id": m.id,
+                    "user_id": m.user_id,
+                    "name": m.name,
+                    "model_type": m.model_type,
+                    "accuracy": m.accuracy,
+                    "file_path": m.file_path,
+                    "created_at": m.created_at,
+                } for m in models
+            ]
+        }
+
+    try:
+        return metadata_cache.get_or_load(("models", "all" if is_admin else current_user.id), query_models)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to query models: {str(e)}")
 
-    return {
-        "models": [
-            {
-                "id": m.id,
-                "user_id": m.user_id,
-                "name": m.name,
-                "model_type": m.model_type,
-                "accuracy": m.accuracy,
-                "file_path": m.file_path,
-                "created_at": m.created_at,
-            } for m in models
-        ]
-
-    }
-
 
 @app.post("/load-model/", tags=["Model Management"])
 def load_model(
@@ -227,9 +442,10 @@ def load_model(
     """
     Load a previously saved model by file name (e.g., 'RandomForest_latest').
 
-    The model must exist in the saved_models folder. 
+    The model must exist in artifact storage.
     """
     global trained_model, current_model_name, current_model_type
+    global current_model_key, current_model_digest
 
     # Fetch metadata for the model
     model_record = db.query(TrainedModel).filter_by(name=file_name).first()
@@ -247,12 +463,22 @@ def load_model(
         )
         current_model_name = model_record.name
         current_model_type = model_record.model_type
+        current_model_key = os.path.basename(model_record.file_path)
+        current_model_digest = storage.digest(current_model_key)
+        if pool.inference_pool is not None:
+            pool.inference_pool.warm(current_model_type, current_model_key, current_model_digest)
         return {"message": f"Model '{file_name}' loaded successfully."}
     except FileNotFoundError:
         return JSONResponse(
             status_code=404,
             content={"error": f"No saved model file found for '{file_name}'."}
         )
+    except pool.InferenceUnavailable as e:
+        return JSONResponse(
+            status_code=503,
+            content={"error": str(e)},
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -266,12 +492,14 @@ def delete_model(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
     ):
-    model_path = os.path.join(SAVED_MODELS_DIR, file_name)
-
     if not is_valid_filename(file_name):
         return JSONResponse(status_code=400, content={"error": "Invalid filename."})
 
-    model_record = db.query(TrainedModel).filter(TrainedModel.file_path == model_path).first()
+    # Older records store the path under saved_models/ instead of the bare key
+    model_record = db.query(TrainedModel).filter(or_(
+        TrainedModel.file_path == file_name,
+        TrainedModel.file_path == os.path.join(SAVED_MODELS_DIR, file_name),
+    )).first()
 
     if not model_record:
         return JSONResponse(status_code=404, content={"error": "Model metadata not found in DB."})
@@ -279,11 +507,12 @@ def delete_model(
     if model_record.user_id != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="You do not have permission to delete this model.")
 
-    if not os.path.exists(model_path):
-        return JSONResponse(status_code=404, content={"error": f"File '{model_path}' not found."})
+    if not storage.exists(file_name):
+        return JSONResponse(status_code=404, content={"error": f"File '{file_name}' not found."})
 
     try:
-        os.remove(model_path)
+        for key in artifact_keys(file_name):
+            storage.delete(key)
         db.delete(model_record)
         db.commit()
         return {"message": f"Model file '{file_name}' deleted successfully."}
@@ -314,9 +543,9 @@ def delete_all_models(
 
         for model in models:
             try:
-                file_path = os.path.normpath(model.file_path)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+                if storage.exists(model.file_path):
+                    for key in artifact_keys(model.file_path):
+                        storage.delete(key)
                     deleted_files.append(model.name)
                 db.delete(model)
             except Exception as e:
@@ -342,7 +571,7 @@ def rename_model(
 ):
     """
     Rename a trained model: updates both the logical name in the DB
-    and the actual filename on disk.
+    and the artifact's storage key.
 
     Both `current_name` and `new_name` should NOT include file extensions.
     """
@@ -361,30 +590,100 @@ def rename_model(
     _, ext = os.path.splitext(old_path)
     ext = ext.lstrip(".")  # remove the dot
 
-    old_file_path = os.path.join(SAVED_MODELS_DIR, f"{current_name}.{ext}")
-    new_file_path = os.path.join(SAVED_MODELS_DIR, f"{new_name}.{ext}")
+    old_key = os.path.basename(old_path)
+    new_key = f"{new_name}.{ext}"
 
     # Check if new name already exists (logical or physical)
     if db.query(TrainedModel).filter_by(name=new_name).first():
         raise HTTPException(status_code=400, detail="A model with the new name already exists in the database.")
 
-    if os.path.exists(new_file_path):
-        raise HTTPException(status_code=400, detail="A file with the new name already exists on disk.")
+    if storage.exists(new_key):
+        raise HTTPException(status_code=400, detail="A file with the new name already exists in storage.")
 
     try:
-        os.rename(old_file_path, new_file_path)
+        for old_artifact, new_artifact in zip(artifact_keys(old_key), artifact_keys(new_key)):
+            if storage.exists(old_artifact):
+                storage.rename(old_artifact, new_artifact)
         model_record.name = new_name
-        model_record.file_path = new_file_path
+        model_record.file_path = new_key
         db.commit()
         db.refresh(model_record)
         return {"message": f"Model renamed to '{new_name}' successfully."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to rename model: {str(e)}")
 
+@app.post("/compact-model/", tags=["Model Management"])
+async def compact_saved_model(
+    model_name: str = Form(..., description="Logical name of the model to compact"),
+    target: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    upload_id: str = Form(""),      # finalized resumable upload, instead of `file`
+    target_latency_ms: float = Form(0, description=f"Max latency per batch of {COMPACT_BENCHMARK_ROWS} rows (0 = no target)"),
+    target_size_mb: float = Form(0, description="Max artifact size in MB (0 = no target)"),
+    test_size: float = Form(0.2),
+    new_name: str = Form(""),       # defaults to '<model_name>_compact' (suffixed if taken)
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Compact a saved random forest (fewer, shallower trees) or neural net
+    (float16 / int8 quantized TFLite) to meet a latency and/or size target.
+
+    Candidates are benchmarked on a held-out split of the uploaded labelled
+    data. The best one is saved as a new model, with its accuracy loss,
+    latency and size recorded in the model's metrics.
+    """
+    model_record = db.query(TrainedModel).filter_by(name=model_name).first()
+    if not model_record:
+        raise HTTPException(status_code=404, detail="Model metadata not found in DB")
+    if model_record.user_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="You do not have access to this model.")
+    try:
+        new_name = resolve_compact_name(db, model_record, new_name or None)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+    admission.check_rate("train", current_user)
+
+    try:
+        if upload_id:
+            df = await run_in_threadpool(load_upload_dataset, upload_id, current_user)
+        elif file is not None:
+            df = await load_csv_data(file)
+        else:
+            raise ValueError("Provide either a file or an upload_id.")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    if target not in df.columns:
+        raise HTTPException(status_code=400, detail=f"Target column '{target}' not found in dataset.")
+
+    try:
+        async with admission.slot("train", current_user):
+            return await run_in_threadpool(
+                compact_model,
+                db=db,
+                record=model_record,
+                X=df.drop(columns=[target]),
+                y=df[target],
+                user_id=current_user.id,
+                target_latency_ms=target_latency_ms or None,
+                target_size_mb=target_size_mb or None,
+                test_size=test_size,
+                new_name=new_name
+            )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Compaction failed: {str(e)}")
+
 @app.get("/model-metadata/", tags=["Model Management"])
 def get_model_metadata(
     file_name: str = Query(..., description="Logical name of the model (no extension)"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -393,27 +692,63 @@ def get_model_metadata(
     Requires the logical model name (excluding the file extension).
     """
 
-    model_record = db.query(TrainedModel).filter_by(name=file_name).first()
+    def query_metadata(session: Session):
+        model_record = session.query(TrainedModel).filter_by(name=file_name).first()
+        if not model_record:
+            return None
+        return {
+            "id": model_record.id,
+            "user_id": model_record.user_id,
+            "name": model_record.name,
+            "model_type": model_record.model_type,
+            "accuracy": model_record.accuracy,
+            "parameters": model_record.parameters,
+            "metrics": model_record.metrics,
+            "file_path": model_record.file_path,
+            "created_at": model_record.created_at,
+        }
 
-    if not model_record:
+    metadata = metadata_cache.get_or_load(("model", file_name), lambda: query_metadata(db))
+    if metadata is None and read_engine is not engine:
+        # Not on the replica yet (e.g. just trained); ask the primary
+        with SessionLocal() as primary:
+            metadata = query_metadata(primary)
+
+    if metadata is None:
         raise HTTPException(status_code=404, detail="Model metadata not found in the database.")
 
-    if model_record.user_id != current_user.id and current_user.role != "admin":
+    if metadata["user_id"] != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="You do not have access to this model.")
 
-    return {
-        "id": model_record.id,
-        "user_id": model_record.user_id,
-        "name": model_record.name,
-        "model_type": model_record.model_type,
-        "accuracy": model_record.accuracy,
-        "parameters": model_record.parameters,
-        "file_path": model_record.file_path,
-        "created_at": model_record.created_at,
-    }
+    return metadata
 
 def is_valid_filename(file_name: str) -> bool:
-    return re.fullmatch(r"[\w\-. ]+\.(joblib|keras)", file_name or "", re.IGNORECASE) is not None
+    return re.fullmatch(r"[\w\-. ]+\.(joblib|keras|tflite)", file_name or "", re.IGNORECASE) is not None
+
+def run_prediction(input_data: Any, return_proba: bool) -> list:
+    """
+    Predict with the current model, in the inference workers when they are enabled.
+    The request is then offered to the shadow candidate, if one is running.
+
+    The latency passed to the shadow evaluator is the prediction time only
+    (without the round trip to an inference worker), which is what the
+    candidate's latency measures as well.
+    """
+    if pool.inference_pool is not None:
+        prediction, details = pool.inference_pool.predict_detailed(
+            current_model_type, current_model_key, input_data, return_proba, current_model_digest
+        )
+        compute_ms = details["compute_ms"]
+    else:
+        started = time.perf_counter()
+        prediction = make_prediction(trained_model, current_model_type, input_data, return_proba)
+        compute_ms = (time.perf_counter() - started) * 1000
+    shadow.submit(input_data, prediction, return_proba, compute_ms, current_model_name)
+    return prediction
+
+def inference_unavailable(e: Exception) -> HTTPException:
+    # A worker was restarted mid-request; the client can retry shortly
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
 
 def ensure_model_loaded():
     if trained_model is None or current_model_name is None:
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Any, Tuple, List
+from typing import Any, Tuple, List, Optional
+import numpy as np
 import pandas as pd
 
 class BaseModel(ABC):
@@ -7,14 +8,21 @@ class BaseModel(ABC):
     Abstract base class for all models in the system.
     """
 
+    preprocessor: Any = None  # fitted FeaturePreprocessor saved with the model
+    budget: Any = None        # TrainingBudget checked during train(), if set
+    training_info: Any = None # how training ended (early stop, budget, ...)
+    evaluation: Any = None    # holdout metrics report (see services.evaluation)
+    n_classes: Any = None     # number of class codes (0..n-1) in the full dataset, if known
+
     def __init__(self):
         self.model: Any = None  # Common attribute for subclasses
 
     @abstractmethod
-    def train(self, X: pd.DataFrame, y: pd.Series) -> Tuple[Any, float]:
+    def train(self, X: pd.DataFrame, y: pd.Series) -> Any:
         """
         Train the model using provided features and target.
-        Returns the trained model and an evaluation metric (e.g., accuracy).
+        Returns the trained model. Evaluation is left to the caller, which
+        scores a holdout set (see services.evaluation).
         """
         pass
 
@@ -24,4 +32,35 @@ class BaseModel(ABC):
         Predict output using the trained model and new input data.
         Each row in input_data should be a list of feature values.
         """
-        pass
\ No newline at end of file
+        pass
+
+    def predict_proba(self, input_data: List[List[float]]) -> List[List[float]]:
+        """
+        Predict class probabilities, one column per class.
+        Raises NotImplementedError if the underlying model has no probabilities.
+        """
+        return self.predict_proba_array(input_data).tolist()
+
+    def predict_proba_array(self, input_data: Any) -> np.ndarray:
+        """
+        Same as `predict_proba`, as a float array (no list conversion).
+        """
+        if not hasattr(self.model, "predict_proba"):
+            raise NotImplementedError("This model does not provide class probabilities.")
+        return np.asarray(self.model.predict_proba(input_data))
+
+    def class_labels(self) -> Optional[list]:
+        """
+        Class label of each probability column, or None when the columns are
+        the class codes 0..n-1 themselves.
+        """
+        classes = getattr(self.model, "classes_", None)
+        return None if classes is None else np.asarray(classes).tolist()
+
+    def prepare_input(self, input_data: Any) -> Any:
+        """
+        Apply the fitted preprocessor (if any) to raw rows or a DataFrame.
+        """
+        if self.preprocessor is None:
+            return input_data
+        return self.preprocessor.transform(input_data)
@@ -1,8 +1,11 @@
 from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import accuracy_score
+from sklearn.exceptions import ConvergenceWarning
 from models.base_model import BaseModel
+from utils.threads import thread_budget
 import pandas as pd
-from typing import Any, Tuple, List
+from typing import Any, List
+import numpy as np
+import warnings
 
 
 class LogisticRegressionModel(BaseModel):
@@ -17,21 +20,42 @@ class LogisticRegressionModel(BaseModel):
         self.params = params or {}
         self.model = None
 
-    def train(self, X: pd.DataFrame, y: pd.Series) -> Tuple[Any, float]:
+    def train(self, X: pd.DataFrame, y: pd.Series) -> Any:
         """
         Train the Logistic Regression model.
 
-        Returns:
-        - Trained model
-        - Accuracy score on training data
+        Returns the trained model.
+
+        With a training budget and a solver that supports warm starts, the
+        solver runs in slices of `max_iter` so the budget can stop it early.
         """
-        self.model = LogisticRegression(**self.params)
-        self.model.fit(X, y)
+        self.model = LogisticRegression(**{"n_jobs": thread_budget("train"), **self.params})
+        max_iter = self.model.max_iter
+        reason = None
 
-        y_pred = self.model.predict(X)
-        acc = accuracy_score(y, y_pred)
+        if self.budget is None or self.model.solver == "liblinear":
+            self.model.fit(X, y)
+            n_iter = int(np.max(self.model.n_iter_))
+        else:
+            self.model.set_params(warm_start=True)
+            step = max(10, max_iter // 10)
+            n_iter = 0
+            while n_iter < max_iter:
+                self.model.set_params(max_iter=min(step, max_iter - n_iter))
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", ConvergenceWarning)
+                    self.model.fit(X, y)
+                slice_iter = int(np.max(self.model.n_iter_))
+                n_iter += slice_iter
+                if slice_iter < self.model.max_iter:  # converged
+                    break
+                reason = self.budget.exceeded_reason()
+                if reason:
+                    break
+            self.model.set_params(max_iter=max_iter, warm_start=self.params.get("warm_start", False))
 
-        return self.model, acc
+        self.training_info = {"n_iter": n_iter, "budget_exceeded": reason}
+        return self.model
 
     def predict(self, input_data: List[List[float]]) -> List:
         """
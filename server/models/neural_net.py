@@ -1,34 +1,71 @@
 from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense
-from sklearn.metrics import accuracy_score
+from tensorflow.keras.layers import Dense, Input
+from tensorflow.keras.callbacks import Callback, EarlyStopping
 from models.base_model import BaseModel
+from config.settings import NN_BATCH_BUCKETS, NN_JIT_COMPILE
+from utils.threads import thread_budget
 import pandas as pd
+import threading
 from typing import Any, Tuple, List
 import numpy as np
+import scipy.sparse as sp
+
+
+class BudgetCallback(Callback):
+    """
+    Stops training after the current batch once the job's budget is used up.
+    """
+
+    def __init__(self, budget):
+        super().__init__()
+        self.budget = budget
+        self.reason = None
+
+    def on_train_batch_end(self, batch, logs=None):
+        reason = self.budget.exceeded_reason()
+        if reason:
+            self.reason = reason
+            self.model.stop_training = True
 
 
 class NeuralNetModel(BaseModel):
     """
-    Simple binary classification neural network using Keras.
+    Simple feed-forward classification neural network using Keras.
     """
 
     def __init__(self, params: dict = None):
         self.params = params or {}
         self.model = None
+        self.interpreter = None  # optional TFLite runtime used instead of Keras
+        self.tflite_content = None
+        self._serving_fn = None
+        self._serving_model = None
+        self._jit_compile = NN_JIT_COMPILE
+        self._lock = threading.Lock()  # guards the TFLite interpreter and serving-fn setup
 
-    def train(self, X: pd.DataFrame, y: pd.Series) -> Tuple[Any, float]:
+    def train(self, X: pd.DataFrame, y: pd.Series) -> Any:
         """
-        Train a binary classification neural network.
-        Returns the trained model and accuracy.
+        Train a classification neural network.
+
+        `y` holds class codes 0..n-1 (other labels are encoded first). The
+        output layer covers `n_classes` codes when set, so a training split
+        that lacks some class still lines up with the full label set.
+        Two classes use a single sigmoid output; more classes use a softmax
+        layer. Sparse inputs (scipy matrices, all-sparse DataFrames, or any
+        input when `sparse_input` is set) are fed to Keras without densifying.
+        Returns the trained model.
         """
         # Convert input features and labels
-        X = X.astype(np.float32)
-        y = pd.Categorical(y).codes.astype(np.int64)
+        X, sparse = self._prepare_features(X)
+        y = np.asarray(y)
+        if not (np.issubdtype(y.dtype, np.integer) and (y.size == 0 or y.min() >= 0)):
+            y = pd.Categorical(y).codes
+        y = y.astype(np.int64)
 
-        # Confirm only binary classification
-        unique_labels = np.unique(y)
-        if len(unique_labels) != 2:
-            raise ValueError(f"Binary classification only: found {len(unique_labels)} unique classes.")
+        n_present = len(np.unique(y))
+        if n_present < 2:
+            raise ValueError(f"At least two classes are required: found {n_present}.")
+        n_classes = max(self.n_classes or 0, int(y.max()) + 1)
 
         # Extract hyperparameters
         activation = self.params.get("activation", "relu")
@@ -38,40 +75,264 @@ class NeuralNetModel(BaseModel):
 
         # Build model
         model = Sequential()
-        model.add(Dense(hidden_layers[0], activation=activation, input_dim=X.shape[1]))
-        for units in hidden_layers[1:]:
+        model.add(Input(shape=(X.shape[1],), sparse=sparse))
+        for units in hidden_layers:
             model.add(Dense(units, activation=activation))
-        model.add(Dense(1, activation="sigmoid"))
+        if n_classes == 2:
+            model.add(Dense(1, activation="sigmoid"))
+            loss = "binary_crossentropy"
+        else:
+            model.add(Dense(n_classes, activation="softmax"))
+            loss = "sparse_categorical_crossentropy"
+
+        model.compile(optimizer="adam", loss=loss, metrics=["accuracy"])
 
-        model.compile(optimizer="adam", loss="binary_crossentropy", metrics=["accuracy"])
-        model.fit(X, y, epochs=epochs, batch_size=batch_size, verbose=0)
+        # Early stopping on a held-out slice, plus the job's training budget
+        validation_split = self.params.get("validation_split", 0.1)
+        callbacks = []
+        if validation_split > 0:
+            callbacks.append(EarlyStopping(
+                monitor="val_loss",
+                patience=self.params.get("patience", 5),
+                restore_best_weights=True,
+            ))
+        budget_callback = BudgetCallback(self.budget)
+        if self.budget is not None:
+            callbacks.append(budget_callback)
+
+        history = model.fit(
+            X, y,
+            epochs=epochs,
+            batch_size=batch_size,
+            validation_split=validation_split,
+            callbacks=callbacks,
+            verbose=0,
+        )
 
         self.model = model
+        epochs_run = len(history.history.get("loss", []))
+        self.training_info = {
+            "epochs_run": epochs_run,
+            "stopped_early": epochs_run < epochs,
+            "budget_exceeded": budget_callback.reason,
+        }
+        return self.model
 
-        # Predict
-        y_pred = self.model.predict(X, verbose=0)
+    def _prepare_features(self, X) -> Tuple[Any, bool]:
+        """
+        Return float32 features and whether they are kept sparse.
+        """
+        if sp.issparse(X):
+            return X.tocsr().astype(np.float32), True
+        if isinstance(X, pd.DataFrame) and len(X.columns) and all(
+            isinstance(dtype, pd.SparseDtype) for dtype in X.dtypes
+        ):
+            return X.sparse.to_coo().tocsr().astype(np.float32), True
+        if self.params.get("sparse_input", False):
+            return sp.csr_matrix(np.asarray(X, dtype=np.float32)), True
+        return np.asarray(X, dtype=np.float32), False
 
-        # Assertions for debugging
-        assert y_pred.ndim == 2 and y_pred.shape[1] == 1, f"Unexpected y_pred shape: {y_pred.shape}"
-        assert not np.isnan(y_pred).any(), "NaNs found in y_pred"
-        assert not np.isinf(y_pred).any(), "Infs found in y_pred"
+    def predict(self, input_data: List[List[float]]) -> List[int]:
+        """
+        Predict class labels.
+        """
+        return np.argmax(self._proba(input_data), axis=1).tolist()
 
-        y_pred_labels = (y_pred > 0.5).astype(np.int64).flatten()
+    def predict_proba(self, input_data: List[List[float]]) -> List[List[float]]:
+        """
+        Predict class probabilities, one column per class (same layout as
+        sklearn's `predict_proba`).
+        """
+        return self._proba(input_data).tolist()
 
-        # More assertions
-        assert y.shape == y_pred_labels.shape, f"Shape mismatch: y {y.shape}, y_pred {y_pred_labels.shape}"
-        assert y.dtype == y_pred_labels.dtype, f"Dtype mismatch: y {y.dtype}, y_pred {y_pred_labels.dtype}"
+    def predict_proba_array(self, input_data: Any) -> np.ndarray:
+        return self._proba(input_data)
 
-        acc = accuracy_score(y, y_pred_labels)
-        return self.model, acc
+    def _proba(self, input_data) -> np.ndarray:
+        scores = self.predict_scores(input_data)
+        if scores.shape[1] == 1:
+            return np.hstack([1.0 - scores, scores])
+        return scores
 
-    def predict(self, input_data: List[List[float]]) -> List[int]:
+    def predict_scores(self, input_data: List[List[float]]) -> np.ndarray:
+        """
+        Return the raw network outputs for the given rows.
+
+        Rows are zero-padded up to the nearest size in NN_BATCH_BUCKETS so the
+        compiled serving function only ever sees a handful of fixed shapes.
+        Larger batches are split into chunks of the biggest bucket.
+        """
+        if self.model is None and self.interpreter is None:
+            raise ValueError("Model not trained.")
+
+        if sp.issparse(input_data):
+            input_array = input_data.tocsr()
+        else:
+            input_array = np.asarray(input_data, dtype=np.float32)
+            if input_array.ndim == 1:
+                input_array = input_array.reshape(1, -1)
+
+        max_bucket = NN_BATCH_BUCKETS[-1]
+        outputs = []
+        for start in range(0, input_array.shape[0], max_bucket):
+            chunk = input_array[start:start + max_bucket]
+            if sp.issparse(chunk):
+                chunk = chunk.toarray()
+            bucket = next(b for b in NN_BATCH_BUCKETS if b >= len(chunk))
+            padded = np.zeros((bucket, input_array.shape[1]), dtype=np.float32)
+            padded[:len(chunk)] = chunk
+            outputs.append(self._run_batch(padded)[:len(chunk)])
+
+        if not outputs:
+            return np.zeros((0, self._n_outputs()), dtype=np.float32)
+        return np.concatenate(outputs, axis=0)
+
+    def _run_batch(self, batch: np.ndarray) -> np.ndarray:
+        if self.interpreter is not None:
+            # One interpreter per model, shared by all request threads; its
+            # tensors are not safe to use concurrently.
+            with self._lock:
+                return self._run_tflite(batch)
+        serve = self._get_serving_fn()
+        try:
+            return serve(batch).numpy()
+        except Exception as e:
+            if not self._disable_jit(serve, e):
+                raise
+            return self._get_serving_fn()(batch).numpy()
+
+    def _get_serving_fn(self):
         """
-        Predict class labels for binary classification.
+        Build (once per loaded Keras model) a tf.function with a fixed input
+        signature. Keras `predict` sets up a dataset and callbacks on every call;
+        calling the compiled graph directly skips all of that.
+        """
+        with self._lock:
+            if self._serving_fn is None or self._serving_model is not self.model:
+                import tensorflow as tf
+
+                model = self.model
+                n_features = model.input_shape[-1]
+
+                @tf.function(
+                    input_signature=[tf.TensorSpec([None, n_features], tf.float32)],
+                    jit_compile=self._jit_compile,
+                )
+                def serve(x):
+                    # Apply the layers directly so dense batches also work for
+                    # networks whose input was declared sparse during training.
+                    for layer in model.layers:
+                        x = layer(x)
+                    return x
+
+                self._serving_fn = serve
+                self._serving_model = model
+            return self._serving_fn
+
+    def _disable_jit(self, serve, error: Exception) -> bool:
+        """
+        Drop the XLA-compiled serving function after it failed, so the next
+        call rebuilds it in plain graph mode. Returns False when `serve` was
+        not XLA-compiled (the error is then a real one).
+        """
+        with self._lock:
+            if serve is not self._serving_fn:
+                return True  # another thread already rebuilt it
+            if not self._jit_compile:
+                return False
+            print(f"[WARN] XLA compilation of the serving function failed, using graph mode: {error}")
+            self._jit_compile = False
+            self._serving_fn = None
+            return True
+
+    def _n_outputs(self) -> int:
+        if self.interpreter is not None:
+            return int(self.interpreter.get_output_details()[0]["shape"][-1])
+        return int(self.model.output_shape[-1])
+
+    def _run_tflite(self, batch: np.ndarray) -> np.ndarray:
+        input_details = self.interpreter.get_input_details()[0]
+        output_details = self.interpreter.get_output_details()[0]
+        if tuple(input_details["shape"]) != batch.shape:
+            self.interpreter.resize_tensor_input(input_details["index"], batch.shape)
+            self.interpreter.allocate_tensors()
+        self.interpreter.set_tensor(input_details["index"], batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(output_details["index"])
+
+    def export_tflite(self, path: str) -> None:
+        """
+        Write a TFLite copy of the trained network to `path`.
+        """
+        with open(path, "wb") as f:
+            f.write(self.to_tflite())
+
+    def to_tflite(self, quantization: str = None, representative_data=None) -> bytes:
+        """
+        Convert the trained network to a TFLite flatbuffer.
+
+        quantization: None (float32), "float16" (float16 weights), "dynamic"
+        (int8 weights) or "int8" (int8 weights and activations, calibrated on
+        `representative_data`; inputs and outputs stay float32).
+        """
+        if self.model is None:
+            raise ValueError("Model not trained.")
+
+        import tensorflow as tf
+
+        converter = tf.lite.TFLiteConverter.from_keras_model(self.model)
+        if quantization is not None:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+        elif quantization == "int8":
+            if representative_data is None:
+                raise ValueError("int8 quantization needs representative data.")
+            if sp.issparse(representative_data):
+                representative_data = representative_data[:200].toarray()
+            rows = np.asarray(representative_data, dtype=np.float32)[:200]
+
+            def representative_dataset():
+                for row in rows:
+                    yield [row.reshape(1, -1)]
+
+            converter.representative_dataset = representative_dataset
+        elif quantization not in (None, "dynamic"):
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        return converter.convert()
+
+    def to_onnx(self) -> bytes:
+        """
+        Convert the trained network to a serialized ONNX graph that maps
+        float32 rows to the raw network outputs.
         """
         if self.model is None:
             raise ValueError("Model not trained.")
 
-        input_array = np.array(input_data, dtype=np.float32)
-        output = self.model.predict(input_array, verbose=0)
-        return np.round(output).astype(int).flatten().tolist()
+        import tensorflow as tf
+        import tf2onnx
+
+        model = self.model
+
+        @tf.function(input_signature=[tf.TensorSpec([None, model.input_shape[-1]], tf.float32, name="input")])
+        def serve(x):
+            for layer in model.layers:
+                x = layer(x)
+            return x
+
+        onnx_model, _ = tf2onnx.convert.from_function(serve, input_signature=serve.input_signature, opset=17)
+        return onnx_model.SerializeToString()
+
+    def load_tflite(self, path: str = None, content: bytes = None) -> None:
+        """
+        Serve predictions from a TFLite file (or flatbuffer bytes) instead of
+        the Keras model.
+        """
+        import tensorflow as tf
+
+        if content is None:
+            with open(path, "rb") as f:
+                content = f.read()
+        self.tflite_content = content
+        self.interpreter = tf.lite.Interpreter(model_content=content, num_threads=thread_budget("predict"))
+        self.interpreter.allocate_tensors()
@@ -0,0 +1,60 @@
+from models.base_model import BaseModel
+import pandas as pd
+from typing import Any, List, Optional
+import json
+import numpy as np
+import scipy.sparse as sp
+
+
+class OnnxModel(BaseModel):
+    """
+    Inference-only model served by onnxruntime on CPU from an exported ONNX
+    graph. Works the same for every model type and needs neither
+    scikit-learn nor TensorFlow at predict time.
+    """
+
+    def __init__(self, content: bytes, threads: int = 1):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.model = ort.InferenceSession(content, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.model.get_inputs()[0].name
+        outputs = [o.name for o in self.model.get_outputs()]
+        # sklearn graphs return (label, probabilities); networks return raw scores only
+        self.label_output = "label" if "label" in outputs else None
+        self.proba_output = "probabilities" if "probabilities" in outputs else outputs[0]
+        self.metadata = self.model.get_modelmeta().custom_metadata_map
+
+    def train(self, X: pd.DataFrame, y: pd.Series) -> Any:
+        raise ValueError("ONNX models are inference-only.")
+
+    def _run(self, input_data, outputs: List[str]) -> list:
+        if sp.issparse(input_data):
+            input_data = input_data.toarray()
+        rows = np.asarray(input_data, dtype=np.float32)
+        if rows.ndim == 1:
+            rows = rows.reshape(1, -1)
+        return self.model.run(outputs, {self.input_name: rows})
+
+    def _proba(self, input_data) -> np.ndarray:
+        scores = np.asarray(self._run(input_data, [self.proba_output])[0], dtype=np.float64)
+        if scores.shape[1] == 1:  # single sigmoid output
+            return np.hstack([1.0 - scores, scores])
+        return scores
+
+    def predict(self, input_data: List[List[float]]) -> List:
+        if self.label_output is not None:
+            return self._run(input_data, [self.label_output])[0].tolist()
+        return np.argmax(self._proba(input_data), axis=1).tolist()
+
+    def predict_proba(self, input_data: List[List[float]]) -> List[List[float]]:
+        return self._proba(input_data).tolist()
+
+    def class_labels(self) -> Optional[list]:
+        classes = self.metadata.get("classes")  # recorded at export time
+        return None if classes is None else json.loads(classes)
+
+    def predict_proba_array(self, input_data: Any) -> np.ndarray:
+        return self._proba(input_data)
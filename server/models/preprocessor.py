@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from typing import Any, Dict, List
+from config.settings import PREPROCESS_SPARSE_MIN_COLUMNS
+
+
+class FeaturePreprocessor:
+    """
+    Fitted feature preprocessing saved together with a trained model.
+
+    Captures the training schema, then at predict time reorders columns,
+    imputes missing values (median for numeric, most frequent for
+    categorical), standardizes numeric columns and one-hot encodes
+    categorical ones. Output is float32: dense, or CSR when the one-hot
+    block is wider than PREPROCESS_SPARSE_MIN_COLUMNS.
+    """
+
+    def __init__(self):
+        self.feature_names: List[str] = []
+        self.numeric_columns: List[str] = []
+        self.categorical_columns: List[str] = []
+        self.medians = None
+        self.means = None
+        self.scales = None
+        self.categories: Dict[str, List[Any]] = {}
+        self.modes: Dict[str, Any] = {}
+        self.sparse_output = False
+
+    def fit(self, X: pd.DataFrame) -> "FeaturePreprocessor":
+        self.feature_names = [str(c) for c in X.columns]
+        X = X.set_axis(self.feature_names, axis=1)
+
+        self.numeric_columns = [
+            c for c in self.feature_names
+            if pd.api.types.is_numeric_dtype(X[c]) and not pd.api.types.is_bool_dtype(X[c])
+        ]
+        self.categorical_columns = [c for c in self.feature_names if c not in self.numeric_columns]
+
+        numeric = X[self.numeric_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        if numeric.shape[1]:
+            with np.errstate(all="ignore"):
+                medians = np.nanmedian(numeric, axis=0)
+            self.medians = np.where(np.isnan(medians), 0.0, medians)
+            numeric = np.where(np.isnan(numeric), self.medians, numeric)
+            self.means = numeric.mean(axis=0)
+            scales = numeric.std(axis=0)
+            self.scales = np.where(scales == 0, 1.0, scales)
+        else:
+            self.medians = self.means = self.scales = np.zeros(0)
+
+        for col in self.categorical_columns:
+            counts = X[col].dropna().astype(str).value_counts()
+            self.categories[col] = counts.index.tolist()
+            self.modes[col] = counts.index[0] if len(counts) else None
+
+        n_onehot = sum(len(v) for v in self.categories.values())
+        self.sparse_output = n_onehot > PREPROCESS_SPARSE_MIN_COLUMNS
+        return self
+
+    @property
+    def output_dim(self) -> int:
+        return len(self.numeric_columns) + sum(len(v) for v in self.categories.values())
+
+    def transform(self, X) -> Any:
+        """
+        Transform a DataFrame (columns matched by name, extras ignored) or a
+        2D list/array whose columns follow the training column order.
+        """
+        if not isinstance(X, pd.DataFrame):
+            rows = np.asarray(X)
+            if rows.dtype.kind not in "biuf":
+                rows = rows.astype(object)
+            if rows.ndim != 2 or rows.shape[1] != len(self.feature_names):
+                raise ValueError(
+                    f"Expected {len(self.feature_names)} features per row in training order: "
+                    f"{self.feature_names}"
+                )
+            X = pd.DataFrame(rows, columns=self.feature_names)
+        else:
+            X = X.set_axis([str(c) for c in X.columns], axis=1)
+            missing = [c for c in self.feature_names if c not in X.columns]
+            if missing:
+                raise ValueError(f"Missing feature columns: {missing}")
+
+        n = len(X)
+        numeric = np.empty((n, len(self.numeric_columns)), dtype=np.float64)
+        for i, col in enumerate(self.numeric_columns):
+            numeric[:, i] = pd.to_numeric(X[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        numeric = np.where(np.isnan(numeric), self.medians, numeric)
+        numeric = ((numeric - self.means) / self.scales).astype(np.float32)
+
+        # One-hot block: (row, column) index pairs for every known category value.
+        rows, cols = [], []
+        offset = len(self.numeric_columns)
+        for col in self.categorical_columns:
+            values = X[col].where(X[col].notna(), self.modes[col]).astype(str)
+            codes = pd.Categorical(values, categories=self.categories[col]).codes
+            known = codes >= 0
+            rows.append(np.flatnonzero(known))
+            cols.append(codes[known].astype(np.int64) + offset)
+            offset += len(self.categories[col])
+
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+
+        if self.sparse_output:
+            onehot = sp.csr_matrix(
+                (np.ones(len(rows), dtype=np.float32), (rows, cols - len(self.numeric_columns))),
+                shape=(n, self.output_dim - len(self.numeric_columns)),
+            )
+            return sp.hstack([sp.csr_matrix(numeric), onehot], format="csr")
+
+        out = np.zeros((n, self.output_dim), dtype=np.float32)
+        out[:, :len(self.numeric_columns)] = numeric
+        out[rows, cols] = 1.0
+        return out
+
+    def fit_transform(self, X: pd.DataFrame) -> Any:
+        return self.fit(X).transform(X)
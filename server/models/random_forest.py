@@ -1,8 +1,9 @@
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score
 from models.base_model import BaseModel
+from utils.threads import thread_budget
+from config.settings import MAX_N_ESTIMATORS
 import pandas as pd
-from typing import Any, Tuple, List
+from typing import Any, List
 
 
 class RandomForestModel(BaseModel):
@@ -17,21 +18,34 @@ class RandomForestModel(BaseModel):
         self.params = params or {}
         self.model = None 
 
-    def train(self, X: pd.DataFrame, y: pd.Series) -> Tuple[Any, float]:
+    def train(self, X: pd.DataFrame, y: pd.Series) -> Any:
         """
         Train the Random Forest Classifier.
 
-        Returns:
-        - The trained model
-        - Accuracy score on training data (for MVP simplicity)
-        """
-        self.model = RandomForestClassifier(**self.params)
-        self.model.fit(X, y)
+        Returns the trained model.
 
-        y_pred = self.model.predict(X)
-        training_accuracy = accuracy_score(y, y_pred)
-
-        return self.model, training_accuracy
+        Trees are grown in chunks (warm start) so a training budget can stop
+        the forest early; the trees built so far are kept.
+        """
+        n_estimators = self.params.get("n_estimators", 100)
+        if n_estimators > MAX_N_ESTIMATORS:
+            raise ValueError(f"n_estimators must be at most {MAX_N_ESTIMATORS}.")
+
+        n_jobs = thread_budget("train")
+        self.model = RandomForestClassifier(**{"n_jobs": n_jobs, **self.params, "warm_start": True})
+        step = max(n_jobs, n_estimators // 10, 1)
+        built = 0
+        reason = None
+        while built < n_estimators:
+            built = min(n_estimators, built + step)
+            self.model.set_params(n_estimators=built)
+            self.model.fit(X, y)
+            reason = self.budget.exceeded_reason() if self.budget else None
+            if reason:
+                break
+        self.model.set_params(warm_start=self.params.get("warm_start", False))
+        self.training_info = {"n_estimators_built": built, "budget_exceeded": reason}
+        return self.model
 
     def predict(self, input_data: List[List[float]]) -> List:
         """
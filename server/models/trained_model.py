@@ -11,5 +11,6 @@ class TrainedModel(Base):
     model_type = Column(String, nullable=False)
     accuracy = Column(Float)
     parameters = Column(JSON)
+    metrics = Column(JSON)          # evaluation / benchmark numbers recorded with the artifact
     file_path = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Text
+from sqlalchemy.sql import func
+from config.db import Base
+
+class TrainingJob(Base):
+    __tablename__ = "training_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    name = Column(String, nullable=False)              # logical model name to save as
+    model_type = Column(String, nullable=False)
+    target = Column(String, nullable=False)
+    test_size = Column(Float, default=0.2)
+    k_folds = Column(Integer, default=0)
+    parameters = Column(JSON)
+    dataset_key = Column(String, nullable=False)       # storage key of the uploaded CSV
+    status = Column(String, nullable=False, default="queued", index=True)  # queued, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String)                         # host:pid of the worker that ran it
+    error = Column(Text)
+    result = Column(JSON)                              # accuracy, file_name, training_info, metrics
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    available_at = Column(DateTime(timezone=True), server_default=func.now())  # retry backoff
+    started_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from fastapi.encoders import jsonable_encoder
 from config.db import get_db
 from dependencies.auth_dependencies import admin_only
 from models.user import User
 from models.trained_model import TrainedModel
+from services.metadata_cache import metadata_cache
 
 router = APIRouter()
 
 @router.get("/admin/users", tags=["Admin"])
 def list_all_users(db: Session = Depends(get_db), current_user: User = Depends(admin_only)):
-    return db.query(User).all()
+    return metadata_cache.get_or_load(("users",), lambda: jsonable_encoder(db.query(User).all()))
 
 
 @router.delete("/admin/user/{user_id}", tags=["Admin"])
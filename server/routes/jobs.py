@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from sqlalchemy.orm import Session
+from datetime import datetime
+import json
+from config.db import get_db
+from dependencies.auth_dependencies import get_current_user
+from models.user import User
+from models.training_job import TrainingJob
+from services.admission import admission
+from services.jobs import store_dataset, enqueue_training_job, job_summary
+from services.trainer import is_supported_model
+
+router = APIRouter()
+
+@router.post("/jobs/fit/", status_code=202, tags=["Training Jobs"])
+async def submit_training_job(
+    file: UploadFile = File(...),
+    model_type: str = Form(...),
+    file_name: str = Form(""),      # Optional custom name
+    target: str = Form(...),
+    test_size: float = Form(0.2),
+    k_folds: int = Form(0),         # 0 = no K-Fold CV
+    params: str = Form("{}"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Queue a training job for the training workers (see training_worker.py).
+    Takes the same fields as /fit/ and returns immediately with the job id;
+    poll /jobs/{job_id} for the result.
+    """
+    admission.check_rate("train", current_user)
+
+    model_type = model_type.strip().lower()
+    try:
+        is_supported_model(model_type)
+        hyperparams = json.loads(params) if isinstance(params, str) else params
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON in 'params'")
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+    if not file_name:
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        file_name = f"{model_type}_{current_user.id}_{timestamp}"
+
+    dataset_key = await store_dataset(file)
+    job = enqueue_training_job(
+        db,
+        user_id=current_user.id,
+        name=file_name,
+        model_type=model_type,
+        target=target,
+        test_size=test_size,
+        k_folds=k_folds,
+        params=hyperparams,
+        dataset_key=dataset_key
+    )
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.get("/jobs/", tags=["Training Jobs"])
+def list_training_jobs(
+    status: str = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    query = db.query(TrainingJob)
+    if current_user.role != "admin":
+        query = query.filter(TrainingJob.user_id == current_user.id)
+    if status:
+        query = query.filter(TrainingJob.status == status)
+    return [job_summary(job) for job in query.order_by(TrainingJob.id.desc()).limit(100)]
+
+
+@router.get("/jobs/{job_id}", tags=["Training Jobs"])
+def get_training_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    job = db.query(TrainingJob).filter(TrainingJob.id == job_id).first()
+    if not job or (job.user_id != current_user.id and current_user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_summary(job)
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+import os
+from config.db import get_db
+from config.settings import SHADOW_SAMPLE_RATE
+from dependencies.auth_dependencies import get_current_user, admin_only
+from models.user import User
+from models.trained_model import TrainedModel
+from services.scoring import get_model
+from services.shadow import shadow
+
+router = APIRouter()
+
+@router.post("/shadow/", tags=["Shadow Evaluation"])
+async def start_shadow(
+    model_name: str = Form(..., description="Candidate model to compare with the loaded one"),
+    sample_rate: float = Form(SHADOW_SAMPLE_RATE, gt=0, le=1),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(admin_only)
+):
+    """
+    Shadow the loaded model with a candidate: a `sample_rate` share of
+    /predict/ and /predict-file/ requests is also scored by the candidate in
+    the background, after the response has been computed. Replaces any
+    running shadow evaluation. Admin only, since it affects every user's traffic.
+    """
+    model_record = db.query(TrainedModel).filter_by(name=model_name).first()
+    if not model_record:
+        raise HTTPException(status_code=404, detail="Model metadata not found in DB")
+
+    try:
+        model = await run_in_threadpool(get_model, model_record.model_type, os.path.basename(model_record.file_path))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No saved model file found for '{model_name}'.")
+
+    shadow.start(model_record.name, model_record.model_type, model, sample_rate)
+    return shadow.status()
+
+
+@router.get("/shadow/", tags=["Shadow Evaluation"])
+def shadow_status(current_user: User = Depends(get_current_user)):
+    """
+    Agreement rate between the loaded model and the candidate, latency
+    percentiles of both (and of their per-request difference), and how many
+    requests were sampled, scored or dropped because the queue was full.
+    """
+    return shadow.status()
+
+
+@router.delete("/shadow/", tags=["Shadow Evaluation"])
+def stop_shadow(current_user: User = Depends(admin_only)):
+    """
+    Stop the shadow evaluation (admin only). Returns its final statistics.
+    """
+    return shadow.stop()
@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from typing import Optional
+from config.settings import UPLOAD_CHUNK_SIZE_MB
+from dependencies.auth_dependencies import get_current_user
+from models.user import User
+from schemas.upload import UploadCreate, UploadFinalize
+from services import uploads
+
+router = APIRouter()
+
+
+def _not_found():
+    return HTTPException(status_code=404, detail="Upload not found")
+
+
+@router.post("/uploads/", status_code=201, tags=["Uploads"])
+def create_upload(body: UploadCreate, current_user: User = Depends(get_current_user)):
+    """
+    Start a resumable upload. Send the file in chunks with PUT /uploads/{upload_id},
+    then call /uploads/{upload_id}/finalize and pass the upload_id to /fit/.
+    """
+    meta = uploads.create_upload(current_user, body.filename, body.total_size, body.sha256)
+    return {**meta, "chunk_size": UPLOAD_CHUNK_SIZE_MB * 1024 * 1024}
+
+
+@router.get("/uploads/{upload_id}", tags=["Uploads"])
+def get_upload(upload_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Upload status. `offset` is the number of bytes received, i.e. where to resume.
+    """
+    try:
+        return uploads.get_upload(upload_id, current_user)
+    except FileNotFoundError:
+        raise _not_found()
+
+
+@router.put("/uploads/{upload_id}", tags=["Uploads"])
+async def put_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    x_chunk_sha256: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Append one chunk (the raw request body) at `offset`. Send the chunk's sha256
+    in the X-Chunk-SHA256 header to have it verified. A wrong offset returns
+    409 with the offset to resume from.
+    """
+    try:
+        new_offset = await uploads.write_chunk(upload_id, current_user, offset, request.stream(), x_chunk_sha256)
+    except FileNotFoundError:
+        raise _not_found()
+    except uploads.UploadConflict as e:
+        return JSONResponse(status_code=409, content={"detail": str(e), "offset": e.offset})
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    return {"upload_id": upload_id, "offset": new_offset}
+
+
+@router.post("/uploads/{upload_id}/finalize", tags=["Uploads"])
+async def finalize_upload(
+    upload_id: str,
+    body: UploadFinalize = UploadFinalize(),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Verify and parse the assembled upload. Returns its columns and row count.
+    """
+    try:
+        return await run_in_threadpool(uploads.finalize_upload, upload_id, current_user, body.sha256)
+    except FileNotFoundError:
+        raise _not_found()
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+
+@router.delete("/uploads/{upload_id}", tags=["Uploads"])
+def delete_upload(upload_id: str, current_user: User = Depends(get_current_user)):
+    try:
+        uploads.delete_upload(upload_id, current_user)
+    except FileNotFoundError:
+        raise _not_found()
+    return {"message": "Upload deleted"}
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class UploadCreate(BaseModel):
+    """
+    Schema for starting a resumable upload.
+
+    Attributes:
+    - filename: Original file name (informational)
+    - total_size: Size of the whole file in bytes (optional, checked on finalize)
+    - sha256: Checksum of the whole file (optional, checked on finalize)
+    """
+    filename: str = ""
+    total_size: Optional[int] = Field(None, ge=0)
+    sha256: Optional[str] = None
+
+class UploadFinalize(BaseModel):
+    """
+    Schema for finalizing a resumable upload.
+
+    Attributes:
+    - sha256: Checksum of the whole file (optional, overrides the one given at creation)
+    """
+    sha256: Optional[str] = None
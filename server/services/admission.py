@@ -0,0 +1,162 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Tuple
+from fastapi import HTTPException
+from config.settings import (
+    RATE_LIMITS,
+    FAIR_SHARE_WEIGHTS,
+    WORKLOAD_CONCURRENCY,
+    MAX_QUEUE_LENGTH,
+    MAX_QUEUED_PER_USER,
+)
+
+
+def too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `burst`.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Take one token. Returns 0 on success, otherwise seconds until one is available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class FairQueue:
+    """
+    Weighted fair queue in front of a fixed number of execution slots.
+
+    While slots are free, requests run immediately. Otherwise they wait and
+    are admitted in order of virtual finish time (start-time fair queueing),
+    so a user with a burst of requests only gets their weighted share of the
+    slots. When the queue, or a single user's share of it, is full the
+    request is shed with 429.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, max_per_user: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.active = 0
+        self.virtual_time = 0.0
+        self.finish_tags: Dict[int, float] = {}
+        self.queued: Dict[int, int] = {}
+        self.waiting = []  # heap of (finish_tag, seq, user_id, future)
+        self.seq = itertools.count()
+        self.service_time = 1.0  # moving average of seconds per request
+
+    def retry_after(self) -> float:
+        return self.service_time * (len(self.waiting) + 1) / max(1, self.concurrency)
+
+    async def acquire(self, user_id: int, weight: float) -> None:
+        if self.active < self.concurrency and not self.waiting:
+            self.active += 1
+            return
+
+        if len(self.waiting) >= self.max_queue or self.queued.get(user_id, 0) >= self.max_per_user:
+            raise too_many_requests(f"The {self.name} queue is full. Please retry later.", self.retry_after())
+
+        tag = max(self.virtual_time, self.finish_tags.get(user_id, 0.0)) + 1.0 / weight
+        self.finish_tags[user_id] = tag
+        self.queued[user_id] = self.queued.get(user_id, 0) + 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiting, (tag, next(self.seq), user_id, future))
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # the slot was handed over just as we were cancelled
+            else:
+                future.cancel()
+            raise
+
+    def release(self) -> None:
+        while self.waiting:
+            tag, _, user_id, future = heapq.heappop(self.waiting)
+            self.queued[user_id] -= 1
+            if not self.queued[user_id]:
+                del self.queued[user_id]
+            if future.cancelled():
+                continue
+            self.virtual_time = tag
+            future.set_result(True)  # hand the slot straight to the next request
+            return
+        self.active -= 1
+        if not self.active:
+            self.finish_tags.clear()
+            self.virtual_time = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.service_time = 0.8 * self.service_time + 0.2 * seconds
+
+
+class AdmissionController:
+    """
+    Per-user rate limits plus a fair queue for each workload
+    ("predict", "train"). Limits and weights come from config/settings.py,
+    keyed by the user's role. State is per worker process.
+    """
+
+    def __init__(self):
+        self.buckets: Dict[Tuple[str, int], TokenBucket] = {}
+        self.queues = {
+            workload: FairQueue(workload, concurrency, MAX_QUEUE_LENGTH, MAX_QUEUED_PER_USER)
+            for workload, concurrency in WORKLOAD_CONCURRENCY.items()
+        }
+
+    def _limits(self, role: str, workload: str):
+        return RATE_LIMITS.get(role, RATE_LIMITS["user"])[workload]
+
+    def check_rate(self, workload: str, user) -> None:
+        key = (workload, user.id)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            rate, burst = self._limits(user.role or "user", workload)
+            bucket = self.buckets[key] = TokenBucket(rate, burst)
+        wait = bucket.take()
+        if wait:
+            raise too_many_requests(f"Rate limit exceeded for {workload} requests.", wait)
+
+    @asynccontextmanager
+    async def slot(self, workload: str, user):
+        """
+        Hold a fair-queue slot for `workload` while the block runs.
+        """
+        queue = self.queues[workload]
+        await queue.acquire(user.id, FAIR_SHARE_WEIGHTS.get(user.role or "user", 1.0))
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            queue.record(time.monotonic() - started)
+            queue.release()
+
+
+admission = AdmissionController()
@@ -0,0 +1,311 @@
+import copy
+import io
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Optional
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from sqlalchemy.orm import Session
+from config.settings import (
+    COMPACT_TREE_FRACTIONS,
+    COMPACT_MAX_DEPTHS,
+    COMPACT_NN_QUANTIZATIONS,
+    COMPACT_BENCHMARK_ROWS,
+    COMPACT_BENCHMARK_REPEATS,
+)
+from models.base_model import BaseModel
+from models.neural_net import NeuralNetModel
+from models.trained_model import TrainedModel
+from services.db_ops import record_model_metadata
+from services.storage import storage
+from services.trainer import load_model_from_disk, save_model_to_disk
+from utils.threads import with_thread_budget
+
+
+def prune_tree(tree_estimator, max_depth: int):
+    """
+    Copy of a fitted decision tree with every node below `max_depth` removed.
+    Nodes at the cut become leaves and keep the class distribution already
+    stored for them, so no data is needed. The tree arrays are rebuilt, so the
+    pruned tree is also smaller when pickled.
+    """
+    from sklearn.tree._tree import Tree
+
+    state = tree_estimator.tree_.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+    left, right = nodes["left_child"], nodes["right_child"]
+
+    order, new_index = [], {}
+    stack = [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        new_index[node] = len(order)
+        order.append((node, depth))
+        if left[node] != -1 and depth < max_depth:
+            stack.append((right[node], depth + 1))
+            stack.append((left[node], depth + 1))
+
+    old_ids = np.array([node for node, _ in order], dtype=np.intp)
+    pruned = nodes[old_ids].copy()
+    for i, (node, depth) in enumerate(order):
+        if left[node] != -1 and depth < max_depth:
+            pruned["left_child"][i] = new_index[left[node]]
+            pruned["right_child"][i] = new_index[right[node]]
+        else:
+            pruned["left_child"][i] = pruned["right_child"][i] = -1
+            pruned["feature"][i] = -2
+            pruned["threshold"][i] = -2.0
+
+    tree = Tree(
+        tree_estimator.n_features_in_,
+        np.atleast_1d(tree_estimator.n_classes_).astype(np.intp),
+        tree_estimator.n_outputs_,
+    )
+    tree.__setstate__({
+        **state,
+        "max_depth": min(state["max_depth"], max_depth),
+        "node_count": len(order),
+        "nodes": pruned,
+        "values": np.ascontiguousarray(values[old_ids]),
+    })
+    result = copy.copy(tree_estimator)
+    result.tree_ = tree
+    return result
+
+
+def _latency_ms(predict: Callable, X) -> float:
+    """
+    Median wall time of one prediction call on the benchmark batch.
+    """
+    predict(X)  # warm-up (graph tracing, allocator)
+    timings = []
+    for _ in range(COMPACT_BENCHMARK_REPEATS):
+        started = time.perf_counter()
+        predict(X)
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def _benchmark(model: BaseModel, X_eval, y_eval, X_bench, size_bytes: int) -> dict:
+    model = with_thread_budget(model, "predict")
+    accuracy = float(accuracy_score(y_eval, model.predict(X_eval)))
+    latency = _latency_ms(model.predict_proba, X_bench)
+    return {
+        "accuracy": accuracy,
+        "latency_ms": latency,
+        "size_mb": round(size_bytes / (1024 * 1024), 4),
+        "benchmark_rows": COMPACT_BENCHMARK_ROWS,
+    }
+
+
+class _ByteCounter(io.RawIOBase):
+    """
+    Write-only sink that counts bytes instead of keeping them.
+    """
+    def __init__(self):
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.size += len(data)
+        return len(data)
+
+
+def _joblib_size(model: BaseModel) -> int:
+    counter = _ByteCounter()
+    joblib.dump({"model": model.model, "preprocessor": model.preprocessor}, counter)
+    return counter.size
+
+
+def _keras_size(model: NeuralNetModel) -> int:
+    if model.model is None:
+        return len(model.tflite_content or b"")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.keras")
+        model.model.save(path)
+        return os.path.getsize(path)
+
+
+def _forest_candidates(model: BaseModel):
+    """
+    Yield (config, model) for forests with fewer trees and/or shallower trees.
+    """
+    forest = model.model
+    n_trees = len(forest.estimators_)
+    full_depth = max(tree.get_depth() for tree in forest.estimators_)
+    depths = [None] + [d for d in COMPACT_MAX_DEPTHS if d < full_depth]
+
+    for depth in depths:
+        trees = forest.estimators_ if depth is None else [prune_tree(t, depth) for t in forest.estimators_]
+        for fraction in COMPACT_TREE_FRACTIONS:
+            k = max(1, int(round(n_trees * fraction)))
+            if depth is None and k == n_trees:
+                continue  # that is the original model
+            compact = copy.copy(forest)
+            compact.estimators_ = trees[:k]
+            compact.n_estimators = k
+            candidate = copy.copy(model)
+            candidate.model = compact
+            yield {"n_estimators": k, "max_depth": depth or full_depth}, candidate
+
+
+def _network_candidates(model: NeuralNetModel, X_calibration):
+    """
+    Yield (config, model) for TFLite conversions of the network at each
+    quantization level.
+    """
+    if model.model is None:
+        raise ValueError("This network has no Keras weights to quantize.")
+    for quantization in COMPACT_NN_QUANTIZATIONS:
+        try:
+            content = model.to_tflite(None if quantization == "float32" else quantization, X_calibration)
+        except Exception as e:
+            print(f"[WARN] Skipping {quantization} quantization: {e}")
+            continue
+        candidate = NeuralNetModel(model.params)
+        candidate.preprocessor = model.preprocessor
+        candidate.load_tflite(content=content)
+        yield {"quantization": quantization}, candidate
+
+
+def resolve_compact_name(db: Session, record: TrainedModel, new_name: Optional[str] = None) -> str:
+    """
+    Name the compacted model will be saved under. An explicit `new_name` must
+    be free in the database and in storage; the default '<name>_compact' gets
+    a numeric suffix ('<name>_compact_2', ...) until it is.
+    """
+    ext = ".tflite" if record.model_type == "neuralnet" else ".joblib"
+
+    def taken(name: str) -> bool:
+        return db.query(TrainedModel).filter_by(name=name).first() is not None or storage.exists(name + ext)
+
+    if new_name:
+        if taken(new_name):
+            raise ValueError("A model with the new name already exists.")
+        return new_name
+    base = name = f"{record.name}_compact"
+    suffix = 2
+    while taken(name):
+        name = f"{base}_{suffix}"
+        suffix += 1
+    return name
+
+
+def _encode_labels(record: TrainedModel, y: pd.Series):
+    """
+    Map labels onto the integer codes the model was trained with, using the
+    class names recorded at training time. Rows whose label the model never
+    saw are dropped. Returns (class_names, codes).
+    """
+    classes = (record.metrics or {}).get("classes")
+    if not classes:  # older records: fall back to the upload's own classes
+        categorical = pd.Categorical(y)
+        return [str(c) for c in categorical.categories], \
+            pd.Series(categorical.codes.astype(np.int64), index=y.index)
+    codes = y.astype(str).map({name: i for i, name in enumerate(classes)})
+    return classes, codes.dropna().astype(np.int64)
+
+
+def compact_model(
+    db: Session,
+    record: TrainedModel,
+    X: pd.DataFrame,
+    y: pd.Series,
+    user_id: int,
+    target_latency_ms: Optional[float] = None,
+    target_size_mb: Optional[float] = None,
+    test_size: float = 0.2,
+    new_name: Optional[str] = None
+) -> dict:
+    """
+    Shrink a saved random forest (fewer and shallower trees) or neural net
+    (TFLite with float16 / int8 quantization) to meet a latency and/or size
+    target, measuring accuracy on a held-out split of the given data.
+
+    The most accurate candidate that meets every target is saved as a new
+    TrainedModel with its benchmark numbers; if none does, the fastest (or
+    smallest) candidate is saved and `target_met` is false.
+    """
+    if record.model_type not in ("randomforest", "neuralnet"):
+        raise ValueError("Compaction supports randomforest and neuralnet models.")
+    if not target_latency_ms and not target_size_mb:
+        raise ValueError("Provide target_latency_ms and/or target_size_mb.")
+    name = resolve_compact_name(db, record, new_name)
+
+    model = load_model_from_disk(record.model_type, os.path.basename(record.file_path), native=True)
+    n_rows = len(y)
+    classes, y = _encode_labels(record, y)
+    X, rows_dropped = X.loc[y.index], n_rows - len(y)
+    if len(y) < 2:
+        raise ValueError("Not enough rows with labels the model was trained on to evaluate candidates.")
+    try:
+        X_rest, X_eval, _, y_eval = train_test_split(X, y, test_size=test_size, stratify=y)
+    except ValueError:
+        X_rest, X_eval, _, y_eval = train_test_split(X, y, test_size=test_size)
+    if X_eval.shape[0] == 0:
+        raise ValueError("test_size leaves no rows to evaluate candidates on.")
+
+    X_eval = model.prepare_input(X_eval)
+    repeats = -(-COMPACT_BENCHMARK_ROWS // X_eval.shape[0])
+    X_bench = X_eval[np.tile(np.arange(X_eval.shape[0]), repeats)[:COMPACT_BENCHMARK_ROWS]]
+
+    if record.model_type == "randomforest":
+        size_of = _joblib_size
+        candidates = _forest_candidates(model)
+    else:
+        size_of = _keras_size
+        candidates = _network_candidates(model, model.prepare_input(X_rest.iloc[:200]))
+
+    original = _benchmark(model, X_eval, y_eval, X_bench, size_of(model))
+
+    def meets(bench):
+        return (not target_latency_ms or bench["latency_ms"] <= target_latency_ms) and \
+               (not target_size_mb or bench["size_mb"] <= target_size_mb)
+
+    # Only the current best candidate is kept alive; the rest are dropped as
+    # soon as they are benchmarked.
+    metric = "latency_ms" if target_latency_ms else "size_mb"
+    evaluated, best, best_key = 0, None, None
+    for config, candidate in candidates:
+        size = len(candidate.tflite_content) if record.model_type == "neuralnet" else size_of(candidate)
+        bench = _benchmark(candidate, X_eval, y_eval, X_bench, size)
+        evaluated += 1
+        if meets(bench):
+            key = (True, bench["accuracy"], -bench["size_mb"])
+        else:
+            key = (False, -bench[metric], bench["accuracy"])
+        if best is None or key > best_key:
+            best, best_key = (config, candidate, bench), key
+    if best is None:
+        raise ValueError("No compacted candidates could be built for this model.")
+    config, compacted, bench = best
+    target_met = best_key[0]
+
+    metrics = {
+        "classes": classes,
+        "compacted_from": record.name,
+        "compaction": config,
+        "targets": {"latency_ms": target_latency_ms, "size_mb": target_size_mb},
+        "target_met": target_met,
+        "benchmark": bench,
+        "original_benchmark": original,
+        "accuracy_loss": round(original["accuracy"] - bench["accuracy"], 6),
+    }
+    final_file_name = save_model_to_disk(compacted, name, record.model_type, X_eval)
+    record_model_metadata(db, user_id, name, record.model_type, final_file_name, bench["accuracy"],
+                          record.parameters, metrics)
+
+    return {
+        "name": name,
+        "file_name": final_file_name,
+        **metrics,
+        "candidates_evaluated": evaluated,
+        "rows_dropped": rows_dropped,
+    }
@@ -0,0 +1,133 @@
+from typing import Any, List, Optional
+import numpy as np
+from scipy.stats import rankdata
+from config.settings import EVAL_CALIBRATION_BINS
+from models.base_model import BaseModel
+
+
+def holdout_probabilities(model: BaseModel, X: Any, n_classes: int) -> np.ndarray:
+    """
+    Class probabilities for the holdout rows, one column per class code
+    (0..n_classes-1), from a single prediction pass. Classes the model never
+    saw in training get a zero column.
+    """
+    proba = np.asarray(model.predict_proba_array(X), dtype=np.float64)
+    return expand_columns(proba, getattr(model.model, "classes_", None), n_classes)
+
+
+def expand_columns(proba: np.ndarray, columns: Optional[np.ndarray], n_classes: int) -> np.ndarray:
+    if proba.shape[1] == n_classes:
+        return proba
+    if columns is None:  # columns are codes 0..k-1
+        columns = np.arange(proba.shape[1])
+    full = np.zeros((proba.shape[0], n_classes), dtype=np.float64)
+    full[:, np.asarray(columns, dtype=np.int64)] = proba
+    return full
+
+
+def evaluate_holdout(y_true: Any, proba: np.ndarray, class_names: Optional[List[str]] = None) -> dict:
+    """
+    Metrics report computed from one matrix of holdout probabilities:
+    accuracy, confusion matrix, per-class precision/recall/F1/support,
+    one-vs-rest ROC-AUC and top-label calibration bins.
+
+    `y_true` holds integer class codes that index the columns of `proba`.
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    proba = np.asarray(proba, dtype=np.float64)
+    n_rows, n_classes = proba.shape
+    class_names = class_names or [str(i) for i in range(n_classes)]
+
+    y_pred = proba.argmax(axis=1)
+    confusion = np.bincount(y_true * n_classes + y_pred, minlength=n_classes * n_classes)
+    confusion = confusion.reshape(n_classes, n_classes)  # rows: true class, columns: predicted
+
+    true_positives = np.diag(confusion).astype(np.float64)
+    support = confusion.sum(axis=1)
+    predicted = confusion.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted > 0, true_positives / predicted, 0.0)
+        recall = np.where(support > 0, true_positives / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    auc = _roc_auc_ovr(y_true, proba)
+    valid_auc = auc[~np.isnan(auc)]
+    if n_classes == 2:
+        roc_auc = None if np.isnan(auc[1]) else auc[1]
+    else:
+        roc_auc = float(valid_auc.mean()) if valid_auc.size else None
+
+    weights = support / max(1, n_rows)
+    return {
+        "rows": n_rows,
+        "accuracy": _round(true_positives.sum() / max(1, n_rows)),
+        "classes": class_names,
+        "confusion_matrix": confusion.tolist(),
+        "per_class": {
+            name: {
+                "precision": _round(precision[i]),
+                "recall": _round(recall[i]),
+                "f1": _round(f1[i]),
+                "support": int(support[i]),
+                "roc_auc": None if np.isnan(auc[i]) else _round(auc[i]),
+            }
+            for i, name in enumerate(class_names)
+        },
+        "macro_avg": {"precision": _round(precision.mean()), "recall": _round(recall.mean()), "f1": _round(f1.mean())},
+        "weighted_avg": {
+            "precision": _round(weights @ precision),
+            "recall": _round(weights @ recall),
+            "f1": _round(weights @ f1),
+        },
+        "roc_auc": None if roc_auc is None else _round(roc_auc),
+        "calibration": _calibration(proba.max(axis=1), y_pred == y_true, EVAL_CALIBRATION_BINS),
+    }
+
+
+def _roc_auc_ovr(y_true: np.ndarray, proba: np.ndarray) -> np.ndarray:
+    """
+    One-vs-rest ROC-AUC of every class at once, via the rank-sum
+    (Mann-Whitney U) identity. NaN for classes missing from `y_true`.
+    """
+    n_rows, n_classes = proba.shape
+    positives = y_true[:, None] == np.arange(n_classes)
+    n_pos = positives.sum(axis=0).astype(np.float64)
+    n_neg = n_rows - n_pos
+    ranks = rankdata(proba, axis=0)  # ties get their average rank
+    rank_sum = (ranks * positives).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        auc = (rank_sum - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+    return np.where((n_pos > 0) & (n_neg > 0), auc, np.nan)
+
+
+def _calibration(confidence: np.ndarray, correct: np.ndarray, n_bins: int) -> dict:
+    """
+    Reliability bins over the predicted class's probability, plus the
+    expected calibration error (bin-size weighted |accuracy - confidence|).
+    """
+    bins = np.minimum((confidence * n_bins).astype(np.int64), n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    confidence_sum = np.bincount(bins, weights=confidence, minlength=n_bins)
+    correct_sum = np.bincount(bins, weights=correct.astype(np.float64), minlength=n_bins)
+
+    filled = counts > 0
+    mean_confidence = np.where(filled, confidence_sum / np.maximum(counts, 1), 0.0)
+    accuracy = np.where(filled, correct_sum / np.maximum(counts, 1), 0.0)
+    ece = float((np.abs(accuracy - mean_confidence) * counts).sum() / max(1, counts.sum()))
+    return {
+        "expected_calibration_error": _round(ece),
+        "bins": [
+            {
+                "lower": _round(i / n_bins),
+                "upper": _round((i + 1) / n_bins),
+                "count": int(counts[i]),
+                "confidence": _round(mean_confidence[i]),
+                "accuracy": _round(accuracy[i]),
+            }
+            for i in np.flatnonzero(filled)
+        ],
+    }
+
+
+def _round(value) -> float:
+    return round(float(value), 6)
@@ -0,0 +1,354 @@
+import multiprocessing as mp
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Optional, Tuple
+import numpy as np
+import pandas as pd
+from config.settings import settings, INFERENCE_MODELS_PER_WORKER, INFERENCE_HEALTH_INTERVAL, ONNX_SERVING
+
+
+def _to_shared(array: np.ndarray):
+    """
+    Copy an array into a new shared memory block. Returns the block and a
+    small descriptor that can be sent over a pipe instead of the data.
+    """
+    array = np.ascontiguousarray(array)
+    shm = SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, {"shm": shm.name, "shape": array.shape, "dtype": array.dtype.str}
+
+
+def _from_shared(desc: dict, unlink: bool = False) -> np.ndarray:
+    """
+    Copy an array out of the shared memory block described by `desc`,
+    optionally freeing the block afterwards.
+    """
+    shm = SharedMemory(name=desc["shm"])
+    try:
+        return np.array(np.ndarray(desc["shape"], dtype=np.dtype(desc["dtype"]), buffer=shm.buf))
+    finally:
+        shm.close()
+        if unlink:
+            shm.unlink()
+
+
+def _worker_main(conn) -> None:
+    """
+    Entry point of an inference worker process: keeps a small LRU of loaded
+    models and answers predict requests from the API process.
+
+    Models with an ONNX copy are served through onnxruntime; scikit-learn and
+    TensorFlow are only imported once a model without one is requested.
+    """
+    from services.onnx_serving import load_onnx_model, make_onnx_prediction
+    from models.onnx_model import OnnxModel
+
+    models = OrderedDict()
+    native = {}
+
+    def native_stack():
+        if not native:
+            from services.trainer import load_model_from_disk, make_prediction
+            from utils.threads import configure_process_threads
+
+            configure_process_threads("predict")
+            native.update(load=load_model_from_disk, predict=make_prediction)
+        return native
+
+    def get_model(model_type: str, key: str, digest: Optional[str]):
+        cache_key = (key, digest)
+        if cache_key in models:
+            models.move_to_end(cache_key)
+            return models[cache_key]
+        model = load_onnx_model(key) if ONNX_SERVING else None
+        if model is None:
+            model = native_stack()["load"](model_type, key, native=True)
+        models[cache_key] = model
+        while len(models) > INFERENCE_MODELS_PER_WORKER:
+            models.popitem(last=False)
+        return model
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        op = message.get("op")
+        if op == "stop":
+            break
+        if op == "ping":
+            conn.send({"ok": True})
+            continue
+
+        try:
+            model = get_model(message["model_type"], message["key"], message.get("digest"))
+            if op == "load":
+                conn.send({"ok": True})
+                continue
+
+            spec = message["input"]
+            if "shm" in spec:
+                input_data = _from_shared(spec)
+                if spec.get("columns") is not None:
+                    input_data = pd.DataFrame(input_data, columns=spec["columns"])
+            else:
+                input_data = spec["data"]
+
+            started = time.perf_counter()
+            if isinstance(model, OnnxModel):
+                prediction = make_onnx_prediction(model, input_data, message["return_proba"])
+            else:
+                prediction = native_stack()["predict"](
+                    model, message["model_type"], input_data, message["return_proba"]
+                )
+            prediction = np.asarray(prediction)
+            compute_ms = (time.perf_counter() - started) * 1000
+            shm, desc = _to_shared(prediction)
+            # The API process unlinks the block once it has read it
+            resource_tracker.unregister(shm._name, "shared_memory")
+            shm.close()
+            conn.send({"ok": True, "output": desc, "classes": model.class_labels(), "compute_ms": compute_ms})
+        except Exception as e:
+            conn.send({"ok": False, "error": str(e), "type": type(e).__name__})
+
+
+class InferenceUnavailable(RuntimeError):
+    """
+    A worker died or did not answer in time and was restarted; the request
+    can be retried.
+    """
+
+
+def _raise_for(reply: dict) -> None:
+    if reply["type"] in ("ValueError", "FileNotFoundError"):
+        raise ValueError(reply["error"])
+    raise RuntimeError(reply["error"])
+
+
+class _Worker:
+    def __init__(self, ctx, index: int):
+        self.ctx = ctx
+        self.index = index
+        self.lock = threading.Lock()
+        self.restarts = 0
+        self._start()
+
+    def _start(self) -> None:
+        self.loaded = OrderedDict()  # mirrors the worker's LRU of loaded models
+        parent_conn, child_conn = self.ctx.Pipe()
+        self.process = self.ctx.Process(
+            target=_worker_main, args=(child_conn,), daemon=True, name=f"inference-worker-{self.index}"
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def restart(self) -> None:
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join(timeout=5)
+        self.restarts += 1
+        print(f"[WARN] Restarting inference worker {self.index}")
+        self._start()
+
+    def call(self, message: dict, timeout: float) -> dict:
+        """
+        Send one request and wait for its reply. Caller must hold `lock`.
+        A dead, broken or hung worker is restarted.
+        """
+        try:
+            self.conn.send(message)
+            if not self.conn.poll(timeout):
+                raise TimeoutError(f"Inference worker {self.index} did not answer within {timeout}s")
+            return self.conn.recv()
+        except (EOFError, OSError, TimeoutError) as e:
+            self.restart()
+            raise InferenceUnavailable(f"Inference worker failed and was restarted: {e}")
+
+    def ensure_loaded(self, model_type: str, key: str, digest: Optional[str], timeout: float) -> None:
+        """
+        Load a model unless the worker already holds it. Loading (fetching
+        the artifact, importing TensorFlow) can take far longer than a
+        prediction, so it gets its own timeout. Caller must hold `lock`.
+        """
+        cache_key = (key, digest)
+        if cache_key in self.loaded:
+            self.loaded.move_to_end(cache_key)
+            return
+        reply = self.call({"op": "load", "model_type": model_type, "key": key, "digest": digest}, timeout)
+        if not reply["ok"]:
+            _raise_for(reply)
+        self.loaded[cache_key] = True
+        while len(self.loaded) > INFERENCE_MODELS_PER_WORKER:
+            self.loaded.popitem(last=False)
+
+    def stop(self) -> None:
+        with self.lock:
+            try:
+                self.conn.send({"op": "stop"})
+            except OSError:
+                pass
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.terminate()
+
+
+class InferencePool:
+    """
+    Loaded models served from dedicated worker processes, so inference is not
+    serialized on the API process's GIL.
+
+    Each model key is mapped to INFERENCE_REPLICAS_PER_MODEL workers (all of
+    them by default) starting at a hash of the key; requests go to an idle
+    replica. Numeric inputs and outputs travel through shared memory and only
+    a small descriptor is pickled. A model is loaded into a worker before its
+    first prediction there, under `load_timeout` rather than `timeout`. A
+    background thread pings idle workers and restarts any that died.
+    """
+
+    def __init__(self, n_workers: int, replicas: int = 0, timeout: float = 30, load_timeout: float = 300):
+        self.ctx = mp.get_context("spawn")  # TensorFlow and BLAS pools are not fork-safe
+        self.workers = [_Worker(self.ctx, i) for i in range(n_workers)]
+        self.replicas = min(replicas or n_workers, n_workers)
+        self.timeout = timeout
+        self.load_timeout = load_timeout
+        self._rr = 0
+        self._stopped = threading.Event()
+        self._monitor = threading.Thread(target=self._health_loop, daemon=True, name="inference-health")
+        self._monitor.start()
+
+    def _replicas_for(self, key: str):
+        start = zlib.crc32(key.encode()) % len(self.workers)
+        return [self.workers[(start + i) % len(self.workers)] for i in range(self.replicas)]
+
+    def _acquire(self, key: str) -> _Worker:
+        candidates = self._replicas_for(key)
+        self._rr += 1
+        offset = self._rr % len(candidates)
+        ordered = candidates[offset:] + candidates[:offset]
+        for worker in ordered:
+            if worker.lock.acquire(blocking=False):
+                return worker
+        worker = ordered[0]
+        worker.lock.acquire()
+        return worker
+
+    def warm(self, model_type: str, key: str, digest: Optional[str] = None) -> None:
+        """
+        Load a model into every replica that will serve it.
+        """
+        for worker in self._replicas_for(key):
+            with worker.lock:
+                worker.ensure_loaded(model_type, key, digest, self.load_timeout)
+
+    def predict(self, model_type: str, key: str, input_data: Any, return_proba: bool,
+                digest: Optional[str] = None) -> list:
+        return self.predict_detailed(model_type, key, input_data, return_proba, digest)[0]
+
+    def predict_detailed(self, model_type: str, key: str, input_data: Any, return_proba: bool,
+                         digest: Optional[str] = None) -> Tuple[list, dict]:
+        """
+        Same as `predict`, plus details from the worker: `classes`, the label
+        of each probability column (None when columns are class codes), and
+        `compute_ms`, the time spent predicting (without the round trip).
+        """
+        array, columns = None, None
+        if isinstance(input_data, pd.DataFrame):
+            if all(pd.api.types.is_numeric_dtype(t) and not pd.api.types.is_bool_dtype(t) for t in input_data.dtypes):
+                array, columns = input_data.to_numpy(dtype=np.float64), [str(c) for c in input_data.columns]
+        else:
+            array = np.asarray(input_data)
+            if array.dtype.kind not in "biuf":
+                array = None
+
+        shm = None
+        if array is not None:
+            shm, spec = _to_shared(array)
+            spec["columns"] = columns
+        else:
+            spec = {"data": input_data}
+
+        message = {
+            "op": "predict",
+            "model_type": model_type,
+            "key": key,
+            "digest": digest,
+            "input": spec,
+            "return_proba": return_proba,
+        }
+        worker = self._acquire(key)
+        try:
+            worker.ensure_loaded(model_type, key, digest, self.load_timeout)
+            reply = worker.call(message, self.timeout)
+        finally:
+            worker.lock.release()
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+        if not reply["ok"]:
+            _raise_for(reply)
+
+        return _from_shared(reply["output"], unlink=True).tolist(), {
+            "classes": reply.get("classes"),
+            "compute_ms": reply.get("compute_ms"),
+        }
+
+    def _health_loop(self) -> None:
+        while not self._stopped.wait(INFERENCE_HEALTH_INTERVAL):
+            for worker in self.workers:
+                if not worker.lock.acquire(blocking=False):
+                    continue  # busy workers are clearly alive
+                try:
+                    if not worker.process.is_alive():
+                        worker.restart()
+                    else:
+                        reply = worker.call({"op": "ping"}, timeout=self.timeout)
+                        if not reply.get("ok"):
+                            worker.restart()
+                except InferenceUnavailable:
+                    pass  # already restarted by call()
+                finally:
+                    worker.lock.release()
+
+    def status(self) -> list:
+        return [
+            {"worker": w.index, "pid": w.process.pid, "alive": w.process.is_alive(), "restarts": w.restarts}
+            for w in self.workers
+        ]
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        for worker in self.workers:
+            worker.stop()
+
+
+inference_pool: Optional[InferencePool] = None
+
+
+def start_inference_pool() -> Optional[InferencePool]:
+    global inference_pool
+    if settings.INFERENCE_WORKERS > 0 and inference_pool is None:
+        inference_pool = InferencePool(
+            settings.INFERENCE_WORKERS,
+            settings.INFERENCE_REPLICAS_PER_MODEL,
+            settings.INFERENCE_TIMEOUT_SECONDS,
+            settings.INFERENCE_LOAD_TIMEOUT_SECONDS,
+        )
+    return inference_pool
+
+
+def stop_inference_pool() -> None:
+    global inference_pool
+    if inference_pool is not None:
+        inference_pool.shutdown()
+        inference_pool = None
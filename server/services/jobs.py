@@ -0,0 +1,245 @@
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from config.db import SessionLocal
+from config.settings import (
+    JOB_HEARTBEAT_SECONDS,
+    JOB_STALE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BACKOFF_SECONDS,
+)
+from models.training_job import TrainingJob
+from services.db_ops import record_model_metadata
+from services.storage import storage
+from utils.data import read_csv
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def store_dataset(file: UploadFile) -> str:
+    """
+    Copy an uploaded dataset into artifact storage as-is (in chunks, without
+    parsing or decompressing it) so any training worker can fetch it. Returns its storage key.
+    """
+    key = f"dataset_{uuid.uuid4().hex}"  # CSV, compressed CSV or Parquet
+    await file.seek(0)
+    await run_in_threadpool(_copy_to_storage, file.file, key)
+    return key
+
+
+def _copy_to_storage(source, key: str) -> None:
+    # Blocking disk and storage I/O; runs in the threadpool
+    with tempfile.TemporaryDirectory() as tmp:
+        local_path = os.path.join(tmp, key)
+        with open(local_path, "wb") as f:
+            shutil.copyfileobj(source, f, 1024 * 1024)
+        storage.put(key, local_path)
+
+
+def enqueue_training_job(
+    db: Session,
+    user_id: int,
+    name: str,
+    model_type: str,
+    target: str,
+    test_size: float,
+    k_folds: int,
+    params: dict,
+    dataset_key: str
+) -> TrainingJob:
+    job = TrainingJob(
+        user_id=user_id,
+        name=name,
+        model_type=model_type,
+        target=target,
+        test_size=test_size,
+        k_folds=k_folds,
+        parameters=params,
+        dataset_key=dataset_key,
+        status="queued",
+        available_at=utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[TrainingJob]:
+    """
+    Claim the oldest runnable job. On PostgreSQL the candidate row is locked
+    with SELECT ... FOR UPDATE SKIP LOCKED so workers never wait on each
+    other; the conditional UPDATE keeps the claim safe on SQLite too.
+    """
+    now = utcnow()
+    job = (
+        db.query(TrainingJob)
+        .filter(TrainingJob.status == "queued", TrainingJob.available_at <= now)
+        .order_by(TrainingJob.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is None:
+        db.commit()
+        return None
+
+    claimed = (
+        db.query(TrainingJob)
+        .filter(TrainingJob.id == job.id, TrainingJob.status == "queued")
+        .update({
+            TrainingJob.status: "running",
+            TrainingJob.worker_id: worker_id,
+            TrainingJob.attempts: TrainingJob.attempts + 1,
+            TrainingJob.started_at: now,
+            TrainingJob.heartbeat_at: now,
+            TrainingJob.error: None,
+        }, synchronize_session=False)
+    )
+    db.commit()
+    if not claimed:
+        return None
+    db.refresh(job)
+    return job
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """
+    Put running jobs whose worker stopped heartbeating back in the queue
+    (or fail them once they are out of attempts). Returns how many were reset.
+    """
+    cutoff = utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    stale = (
+        db.query(TrainingJob)
+        .filter(TrainingJob.status == "running", TrainingJob.heartbeat_at < cutoff)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for job in stale:
+        job.error = f"Worker {job.worker_id} stopped responding."
+        if job.attempts >= JOB_MAX_ATTEMPTS:
+            job.status = "failed"
+            job.finished_at = utcnow()
+        else:
+            job.status = "queued"
+            job.available_at = utcnow()
+    db.commit()
+    return len(stale)
+
+
+def heartbeat(job_id: int, worker_id: str) -> None:
+    db = SessionLocal()
+    try:
+        db.query(TrainingJob) \
+            .filter(TrainingJob.id == job_id, TrainingJob.worker_id == worker_id, TrainingJob.status == "running") \
+            .update({TrainingJob.heartbeat_at: utcnow()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _lock_if_owned(db: Session, job: TrainingJob, worker_id: str) -> bool:
+    """
+    Lock the job's row (refreshing `job`) and check that this worker still
+    owns it: a worker that stalled past JOB_STALE_SECONDS may have had its
+    job requeued and claimed by another one. The lock is held until the
+    next commit or rollback.
+    """
+    db.query(TrainingJob).filter(TrainingJob.id == job.id).with_for_update().populate_existing().one()
+    if job.worker_id == worker_id and job.status == "running":
+        return True
+    db.rollback()
+    print(f"[WARN] Job {job.id} is no longer owned by {worker_id}; discarding its outcome")
+    return False
+
+
+def run_claimed_job(db: Session, job: TrainingJob, worker_id: str) -> None:
+    """
+    Fetch the job's dataset, train and save the artifact, then record the
+    model metadata and the job's outcome in one transaction, provided the
+    job still belongs to this worker. Bad input fails the job at once; other
+    errors are retried with backoff.
+    """
+    from services.trainer import train_model
+
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(JOB_HEARTBEAT_SECONDS):
+            heartbeat(job.id, worker_id)
+
+    beater = threading.Thread(target=beat, daemon=True, name=f"job-{job.id}-heartbeat")
+    beater.start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            local_path = os.path.join(tmp, job.dataset_key)
+            storage.download(job.dataset_key, local_path)
+            df = read_csv(local_path)
+
+        if job.target not in df.columns:
+            raise ValueError(f"Target column '{job.target}' not found in dataset.")
+
+        model, acc, saved_file_name = train_model(
+            model_type=job.model_type,
+            X=df.drop(columns=[job.target]),
+            y=df[job.target],
+            params=job.parameters or {},
+            test_size=job.test_size,
+            k_fold=job.k_folds,
+            db=db,
+            user_id=job.user_id,
+            file_name=job.name,
+            record=False
+        )
+        if not _lock_if_owned(db, job, worker_id):
+            return
+        job.status = "succeeded"
+        job.result = {"accuracy": acc, "file_name": saved_file_name, "training_info": model.training_info,
+                      "metrics": model.evaluation}
+        job.finished_at = utcnow()
+        # Commits the job's outcome along with the new TrainedModel row
+        record_model_metadata(db, job.user_id, job.name, job.model_type, saved_file_name, acc,
+                              job.parameters or {}, model.evaluation)
+        storage.delete(job.dataset_key)
+    except Exception as e:
+        db.rollback()
+        if not _lock_if_owned(db, job, worker_id):
+            return
+        job.error = str(e)
+        if isinstance(e, ValueError) or job.attempts >= JOB_MAX_ATTEMPTS:
+            job.status = "failed"
+            job.finished_at = utcnow()
+        else:
+            job.status = "queued"
+            job.available_at = utcnow() + timedelta(seconds=JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+        db.commit()
+        if job.status == "failed":
+            storage.delete(job.dataset_key)
+    finally:
+        stop.set()
+        beater.join()
+
+
+def job_summary(job: TrainingJob) -> dict:
+    return {
+        "id": job.id,
+        "user_id": job.user_id,
+        "name": job.name,
+        "model_type": job.model_type,
+        "status": job.status,
+        "attempts": job.attempts,
+        "worker_id": job.worker_id,
+        "error": job.error,
+        "result": job.result,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
@@ -0,0 +1,90 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+from sqlalchemy import event
+from config.db import SessionLocal, read_engine, engine
+from config.settings import METADATA_CACHE_SECONDS, METADATA_CACHE_MAX_ENTRIES
+from models.trained_model import TrainedModel
+from models.user import User
+
+
+class MetadataCache:
+    """
+    Short-lived, in-process cache of metadata responses (model lists,
+    model metadata, user lists).
+
+    Every committed write to a TrainedModel or User through the primary
+    session clears it. Writes from other processes (e.g. the training
+    workers) are only picked up once entries expire after `ttl` seconds.
+
+    With `settle` set (reads served by a lagging replica), nothing is cached
+    for `settle` seconds after a write, so a replica that has not caught up
+    yet cannot refill the cache with the old data.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, settle: float = 0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.settle = settle
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.generation = 0
+        self.settled_at = 0.0
+        self.lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """
+        Cached value for `key`, or the result of `load()`. None results are
+        not cached.
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                return entry[1]
+            generation = self.generation
+
+        value = load()
+        with self.lock:
+            # Skip storing if a write was committed while loading
+            stored_at = time.monotonic()
+            if value is not None and generation == self.generation and self.ttl > 0 \
+                    and stored_at >= self.settled_at:
+                self.entries[key] = (stored_at + self.ttl, value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return value
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.settled_at = time.monotonic() + self.settle
+            self.entries.clear()
+
+
+metadata_cache = MetadataCache(
+    METADATA_CACHE_SECONDS,
+    METADATA_CACHE_MAX_ENTRIES,
+    settle=METADATA_CACHE_SECONDS if read_engine is not engine else 0,
+)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _track_metadata_writes(session, flush_context):
+    if any(isinstance(obj, (TrainedModel, User))
+           for obj in itertools.chain(session.new, session.dirty, session.deleted)):
+        session.info["metadata_changed"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("metadata_changed", False):
+        metadata_cache.invalidate()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_rolled_back_writes(session):
+    session.info.pop("metadata_changed", None)
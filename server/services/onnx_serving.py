@@ -0,0 +1,134 @@
+import json
+import os
+from typing import Any, Optional
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from config.settings import ONNX_PARITY_ROWS, ONNX_PARITY_TOLERANCE
+from models.base_model import BaseModel
+from models.onnx_model import OnnxModel
+from services.storage import artifact_cache
+from utils.threads import thread_budget
+
+# Imports here stay light (no scikit-learn / TensorFlow) so inference workers
+# serving ONNX models never load the training stack.
+
+ONNX_SUFFIX = ".onnx"
+PREPROCESSOR_SUFFIX = ".preprocessor.joblib"
+
+
+def export_onnx(model: BaseModel, sample: Any = None) -> Optional[bytes]:
+    """
+    Convert a trained model to ONNX and check that onnxruntime reproduces
+    the native model's probabilities on `sample` (preprocessed rows; random
+    rows if not given). The rows and expected outputs are stored in the
+    graph's metadata so the check can be repeated at load time.
+
+    Returns the serialized graph, or None if conversion fails or the
+    outputs differ by more than ONNX_PARITY_TOLERANCE.
+    """
+    if model.model is None:
+        return None  # e.g. a TFLite-only network; nothing to convert
+    rows = _parity_rows(model, sample)
+    try:
+        onnx_model = _convert(model, rows.shape[1])
+        candidate = OnnxModel(onnx_model.SerializeToString())
+        expected = np.asarray(model.predict_proba(rows), dtype=np.float64)
+        labels = np.asarray(model.predict(rows))
+        error = _parity_error(candidate, rows, expected, labels)
+    except Exception as e:
+        print(f"[WARN] ONNX export skipped: {e}")
+        return None
+    if error is not None:
+        print(f"[WARN] ONNX export skipped: {error}")
+        return None
+
+    probe = {"rows": rows.tolist(), "proba": expected.tolist(), "labels": labels.tolist()}
+    entry = onnx_model.metadata_props.add()
+    entry.key, entry.value = "parity_probe", json.dumps(probe)
+    classes = model.class_labels()
+    if classes is not None:
+        entry = onnx_model.metadata_props.add()
+        entry.key, entry.value = "classes", json.dumps(classes)
+    return onnx_model.SerializeToString()
+
+
+def _convert(model: BaseModel, n_features: int):
+    import onnx
+
+    if hasattr(model, "to_onnx"):
+        return onnx.load_from_string(model.to_onnx())
+
+    from skl2onnx import to_onnx
+    return to_onnx(
+        model.model,
+        np.zeros((1, n_features), dtype=np.float32),
+        options={id(model.model): {"zipmap": False}},  # plain probability tensor
+        target_opset={"": 17, "ai.onnx.ml": 3},
+    )
+
+
+def _parity_rows(model: BaseModel, sample: Any) -> np.ndarray:
+    if sample is not None:
+        sample = sample[:ONNX_PARITY_ROWS]
+        rows = sample.toarray() if sp.issparse(sample) else np.asarray(sample)
+        return rows.astype(np.float32)
+    if model.preprocessor is not None:
+        n_features = model.preprocessor.output_dim
+    else:
+        n_features = model.model.n_features_in_
+    return np.random.default_rng(0).standard_normal((ONNX_PARITY_ROWS, n_features)).astype(np.float32)
+
+
+def _parity_error(candidate: OnnxModel, rows, expected, labels) -> Optional[str]:
+    proba = np.asarray(candidate.predict_proba(rows), dtype=np.float64)
+    if proba.shape != expected.shape:
+        return f"output shape {proba.shape} differs from native {expected.shape}"
+    diff = float(np.max(np.abs(proba - expected))) if proba.size else 0.0
+    if diff > ONNX_PARITY_TOLERANCE:
+        return f"probabilities differ from the native model by up to {diff:.2e}"
+    if candidate.predict(rows) != np.asarray(labels).tolist():
+        return "predicted labels differ from the native model"
+    return None
+
+
+def load_onnx_model(file_name: str) -> Optional[OnnxModel]:
+    """
+    Load the ONNX copy of a saved model, if it has one and it still passes
+    the parity probe recorded at export time. Returns None otherwise, so
+    callers fall back to the native model.
+    """
+    base, _ = os.path.splitext(os.path.basename(file_name))
+    onnx_key, preprocessor_key = base + ONNX_SUFFIX, base + PREPROCESSOR_SUFFIX
+    cached = set(artifact_cache.prefetch([onnx_key, preprocessor_key]))
+    if onnx_key not in cached:
+        return None
+
+    with artifact_cache.pinned(onnx_key) as path, open(path, "rb") as f:
+        model = OnnxModel(f.read(), threads=thread_budget("predict"))
+    if preprocessor_key in cached:
+        model.preprocessor = artifact_cache.load(preprocessor_key, joblib.load)
+
+    probe = model.metadata.get("parity_probe")
+    if probe is not None:
+        probe = json.loads(probe)
+        error = _parity_error(
+            model,
+            np.asarray(probe["rows"], dtype=np.float32),
+            np.asarray(probe["proba"], dtype=np.float64),
+            probe["labels"],
+        )
+        if error is not None:
+            print(f"[WARN] Not serving {onnx_key} through onnxruntime: {error}")
+            return None
+    return model
+
+
+def make_onnx_prediction(model: OnnxModel, input_data: Any, return_proba: bool = False) -> list:
+    """
+    Same as trainer.make_prediction, without importing the training stack.
+    """
+    input_data = model.prepare_input(input_data)
+    if return_proba:
+        return model.predict_proba(input_data)
+    return model.predict(input_data)
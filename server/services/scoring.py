@@ -0,0 +1,92 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Tuple
+import numpy as np
+from config.settings import MULTI_SCORE_CACHED_MODELS
+from models.base_model import BaseModel
+from models.trained_model import TrainedModel
+from services.storage import storage
+from services.trainer import load_model_from_disk, make_prediction
+from services import inference_pool as pool
+
+_models = OrderedDict()  # (key, digest) -> loaded model, least recently used first
+_models_lock = threading.Lock()
+
+
+def get_model(model_type: str, key: str, digest: Optional[str] = None) -> BaseModel:
+    """
+    Load a saved model, keeping the most recently scored ones in memory.
+    Entries are keyed by digest, so an overwritten artifact is reloaded.
+    """
+    digest = digest or storage.digest(key)
+    cache_key = (key, digest)
+    with _models_lock:
+        if cache_key in _models:
+            _models.move_to_end(cache_key)
+            return _models[cache_key]
+
+    model = load_model_from_disk(model_type, key)
+    with _models_lock:
+        _models[cache_key] = model
+        while len(_models) > MULTI_SCORE_CACHED_MODELS:
+            _models.popitem(last=False)
+    return model
+
+
+def _score_one(record: TrainedModel, input_data: Any) -> Tuple[list, Optional[list]]:
+    """
+    Probabilities of one model, with the class label of each column (None
+    when the columns are class codes).
+    """
+    model_type = record.model_type
+    key = os.path.basename(record.file_path)
+    digest = storage.digest(key)
+    if digest is None:
+        raise FileNotFoundError(f"No saved model file found for '{record.name}'.")
+    if pool.inference_pool is not None:
+        output, details = pool.inference_pool.predict_detailed(model_type, key, input_data, True, digest)
+        return output, details["classes"]
+    model = get_model(model_type, key, digest)
+    return make_prediction(model, model_type, input_data, return_proba=True), model.class_labels()
+
+
+def score_models(records: List[TrainedModel], input_data: Any, return_proba: bool, ensemble: bool) -> dict:
+    """
+    Score one parsed input against several models in parallel.
+
+    The input is parsed once by the caller and shared read-only by every
+    model (through shared memory when the inference workers are enabled).
+    Each model runs a single probability pass; predictions are the class
+    labels of its argmax columns. With `ensemble`, probabilities are
+    averaged across models (soft vote), which needs identical classes.
+    """
+    with ThreadPoolExecutor(max_workers=len(records)) as executor:
+        outputs = list(executor.map(lambda r: _score_one(r, input_data), records))
+
+    results, probabilities, class_sets = {}, [], []
+    for record, (output, classes) in zip(records, outputs):
+        output = np.asarray(output)
+        if output.ndim == 2:
+            classes = np.asarray(classes if classes is not None else np.arange(output.shape[1]))
+            probabilities.append(output)
+            class_sets.append(classes.tolist())
+            entry = {"predictions": classes[output.argmax(axis=1)].tolist()}
+            if return_proba:
+                entry["probabilities"] = output.tolist()
+        else:
+            entry = {"predictions": output.tolist()}  # model has no predict_proba
+        results[record.name] = entry
+
+    response = {"models": results}
+    if ensemble:
+        if len(probabilities) != len(records):
+            raise ValueError("Ensembling requires every model to provide class probabilities.")
+        if any(classes != class_sets[0] for classes in class_sets):
+            raise ValueError("Ensembling requires models trained on the same classes.")
+        mean = np.mean(probabilities, axis=0)
+        response["ensemble"] = {"predictions": np.asarray(class_sets[0])[mean.argmax(axis=1)].tolist()}
+        if return_proba:
+            response["ensemble"]["probabilities"] = mean.tolist()
+    return response
@@ -0,0 +1,170 @@
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+import numpy as np
+from config.settings import SHADOW_QUEUE_SIZE, SHADOW_LATENCY_WINDOW
+from models.base_model import BaseModel
+from services.trainer import make_prediction
+
+
+def _labels(output: Any) -> np.ndarray:
+    """
+    Predicted labels of a prediction result (argmax for probability rows).
+    """
+    output = np.asarray(output)
+    return output.argmax(axis=1) if output.ndim == 2 else output
+
+
+def _percentiles(values) -> Optional[dict]:
+    if not values:
+        return None
+    p50, p95 = np.percentile(values, [50, 95])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3)}
+
+
+class ShadowEvaluator:
+    """
+    Scores a sample of live prediction requests with a candidate model in
+    the background and compares it with the model that answered them.
+
+    `submit` is called after the primary prediction is done and never
+    blocks: requests are sampled at `sample_rate` and handed to a single
+    worker thread through a bounded queue. When the queue is full the
+    request is dropped (and counted), so a slow candidate never slows down
+    the primary path.
+
+    Latencies on both sides are prediction time only (preprocessing and
+    predict, without queueing or the round trip to an inference worker).
+    The candidate runs in this process; nothing here changes process-wide
+    thread limits, so it cannot throttle the primary's requests.
+    """
+
+    def __init__(self, max_queue: int = SHADOW_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.generation = 0  # bumped on start/stop; stale queued work is discarded
+        self.candidate = None
+        self._reset(None, None, None, 0.0)
+
+    def _reset(self, name: Optional[str], model_type: Optional[str], model: Optional[BaseModel],
+               sample_rate: float) -> None:
+        self.candidate_name = name
+        self.candidate_type = model_type
+        self.candidate = model
+        self.sample_rate = sample_rate
+        self.primary_name = None
+        self.started_at = time.time() if model is not None else None
+        self.seen = self.sampled = self.dropped = self.scored = self.errors = 0
+        self.rows_compared = self.rows_agreed = 0
+        self.last_error = None
+        self.latencies = deque(maxlen=SHADOW_LATENCY_WINDOW)  # (primary_ms, candidate_ms)
+
+    def start(self, name: str, model_type: str, model: BaseModel, sample_rate: float) -> None:
+        """
+        Begin shadowing live traffic with `model`, replacing any previous candidate.
+        """
+        with self.lock:
+            self.generation += 1
+            self._reset(name, model_type, model, sample_rate)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True, name="shadow-evaluator")
+                self.thread.start()
+
+    def stop(self) -> dict:
+        """
+        Stop shadowing and return the final statistics.
+        """
+        with self.lock:
+            summary = self._status()
+            self.generation += 1
+            self._reset(None, None, None, 0.0)
+        return summary
+
+    def submit(self, input_data: Any, primary_output: Any, return_proba: bool,
+               primary_ms: float, primary_name: str) -> None:
+        """
+        Offer one answered request to the candidate. Cheap and non-blocking.
+        """
+        if self.candidate is None or primary_name == self.candidate_name:
+            return
+        with self.lock:
+            if self.candidate is None:
+                return
+            if primary_name != self.primary_name:
+                if self.primary_name is not None:  # a different model is now serving
+                    self._reset(self.candidate_name, self.candidate_type, self.candidate, self.sample_rate)
+                self.primary_name = primary_name
+            self.seen += 1
+            if random.random() >= self.sample_rate:
+                return
+            self.sampled += 1
+            item = (self.generation, input_data, primary_output, return_proba, primary_ms)
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            generation, input_data, primary_output, return_proba, primary_ms = self.queue.get()
+            with self.lock:
+                if generation != self.generation:
+                    continue
+                model, model_type = self.candidate, self.candidate_type
+
+            started = time.perf_counter()
+            try:
+                output = make_prediction(model, model_type, input_data, return_proba)
+                candidate_ms = (time.perf_counter() - started) * 1000
+                agreed = _labels(output) == _labels(primary_output)
+                error = None
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+
+            with self.lock:
+                if generation != self.generation:
+                    continue
+                if error is not None:
+                    self.errors += 1
+                    self.last_error = error
+                    continue
+                self.scored += 1
+                self.rows_compared += int(agreed.size)
+                self.rows_agreed += int(agreed.sum())
+                self.latencies.append((primary_ms, candidate_ms))
+
+    def status(self) -> dict:
+        with self.lock:
+            return self._status()
+
+    def _status(self) -> dict:
+        primary = [p for p, _ in self.latencies]
+        candidate = [c for _, c in self.latencies]
+        return {
+            "active": self.candidate is not None,
+            "candidate": self.candidate_name,
+            "primary": self.primary_name,
+            "sample_rate": self.sample_rate,
+            "started_at": self.started_at,
+            "requests_seen": self.seen,
+            "requests_sampled": self.sampled,
+            "requests_dropped": self.dropped,
+            "requests_scored": self.scored,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "queue_length": self.queue.qsize(),
+            "rows_compared": self.rows_compared,
+            "agreement_rate": self.rows_agreed / self.rows_compared if self.rows_compared else None,
+            "latency_ms": {
+                "primary": _percentiles(primary),
+                "candidate": _percentiles(candidate),
+                "difference": _percentiles([c - p for p, c in self.latencies]),
+            },
+        }
+
+
+shadow = ShadowEvaluator()
@@ -0,0 +1,334 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional
+from config.settings import settings, SAVED_MODELS_DIR
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ArtifactStorage(ABC):
+    """
+    Where model artifacts live. Artifacts are addressed by a storage key
+    (e.g. 'my_model.joblib'), which is what TrainedModel.file_path holds.
+    """
+
+    @abstractmethod
+    def put(self, key: str, local_path: str) -> str:
+        """
+        Upload a local file under `key`. Returns its sha256 digest.
+        """
+        pass
+
+    @abstractmethod
+    def download(self, key: str, local_path: str) -> None:
+        pass
+
+    @abstractmethod
+    def digest(self, key: str) -> Optional[str]:
+        """
+        sha256 digest of the stored artifact, or None if it does not exist.
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+    def exists(self, key: str) -> bool:
+        return self.digest(key) is not None
+
+    def local_path(self, key: str) -> Optional[str]:
+        """
+        Path of the artifact on this machine's disk when the backend keeps
+        it there (so no cache is needed), else None.
+        """
+        return None
+
+    def rename(self, old_key: str, new_key: str) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            local_path = os.path.join(tmp, os.path.basename(old_key))
+            self.download(old_key, local_path)
+            self.put(new_key, local_path)
+        self.delete(old_key)
+
+
+class LocalStorage(ArtifactStorage):
+    """
+    Artifacts stored as plain files under a directory (the original
+    saved_models layout).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._digests = {}  # path -> (size, mtime_ns, digest)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, os.path.basename(key))
+
+    def put(self, key: str, local_path: str) -> str:
+        # Copy then rename, so readers of the path never see a partial file
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            shutil.copyfile(local_path, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return self.digest(key)
+
+    def download(self, key: str, local_path: str) -> None:
+        shutil.copyfile(self._path(key), local_path)
+
+    def digest(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        cached = self._digests.get(path)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        digest = file_sha256(path)
+        self._digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def rename(self, old_key: str, new_key: str) -> None:
+        os.rename(self._path(old_key), self._path(new_key))
+
+
+class S3Storage(ArtifactStorage):
+    """
+    Artifacts stored in an S3-compatible bucket. Set S3_ENDPOINT_URL to point
+    at MinIO or another local stand-in.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str = None):
+        import boto3
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{os.path.basename(key)}"
+
+    def put(self, key: str, local_path: str) -> str:
+        digest = file_sha256(local_path)
+        self.client.upload_file(
+            local_path, self.bucket, self._key(key),
+            ExtraArgs={"Metadata": {"sha256": digest}},
+        )
+        return digest
+
+    def download(self, key: str, local_path: str) -> None:
+        self.client.download_file(self.bucket, self._key(key), local_path)
+
+    def digest(self, key: str) -> Optional[str]:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return head.get("Metadata", {}).get("sha256") or head["ETag"].strip('"')
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def rename(self, old_key: str, new_key: str) -> None:
+        self.client.copy_object(
+            Bucket=self.bucket,
+            Key=self._key(new_key),
+            CopySource={"Bucket": self.bucket, "Key": self._key(old_key)},
+            MetadataDirective="COPY",
+        )
+        self.delete(old_key)
+
+
+class ArtifactCache:
+    """
+    Content-addressed, size-bounded local read-through cache in front of an
+    ArtifactStorage. Files are stored by digest (keeping the key's extension,
+    which Keras needs to load), so identical artifacts are downloaded once and
+    a rewritten key never serves stale bytes. Least recently used files are
+    evicted once the cache grows past `max_bytes`; files being read through
+    `pinned`/`load` in this process are never evicted.
+
+    Backends that already keep artifacts on local disk are read in place.
+    """
+
+    def __init__(self, storage: ArtifactStorage, cache_dir: str, max_bytes: int, prefetch_workers: int = 4):
+        self.storage = storage
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.prefetch_workers = prefetch_workers
+        self._lock = threading.Lock()
+        self._pins = {}  # cached path -> number of readers using it
+
+    def _path(self, digest: str, key: str) -> str:
+        _, ext = os.path.splitext(key)
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}{ext}")
+
+    def fetch(self, key: str) -> str:
+        """
+        Local path of the artifact for `key`, downloading it if not cached.
+        The file may be evicted afterwards; read it through `pinned` or `load`.
+        """
+        with self.pinned(key) as path:
+            return path
+
+    def load(self, key: str, loader: Callable[[str], Any]) -> Any:
+        """
+        `loader(path)` on the cached artifact for `key`, pinned while it runs.
+        """
+        with self.pinned(key) as path:
+            return loader(path)
+
+    @contextmanager
+    def pinned(self, key: str):
+        """
+        Yield the local path of the artifact for `key` (downloading it if not
+        cached) and keep it from being evicted until the block exits.
+        """
+        local_path = self.storage.local_path(key)
+        if local_path is not None:
+            if not os.path.exists(local_path):
+                raise FileNotFoundError(f"No saved model found at {key}")
+            yield local_path
+            return
+
+        digest = self.storage.digest(key)
+        if digest is None:
+            raise FileNotFoundError(f"No saved model found at {key}")
+
+        path = self._path(digest, key)
+        with self._lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+        try:
+            try:
+                os.utime(path)  # mark as recently used
+            except FileNotFoundError:
+                self._download(key, digest, path)
+                self._evict()
+            yield path
+        finally:
+            with self._lock:
+                self._pins[path] -= 1
+                if not self._pins[path]:
+                    del self._pins[path]
+
+    def _download(self, key: str, digest: str, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            self.storage.download(key, tmp_path)
+            if len(digest) == 64 and file_sha256(tmp_path) != digest:
+                raise IOError(f"Checksum mismatch while downloading {key}")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def add(self, key: str, local_path: str, digest: str) -> None:
+        """
+        Seed the cache with a file that was just uploaded.
+        """
+        if self.storage.local_path(key) is not None:
+            return
+        path = self._path(digest, key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+            shutil.copyfile(local_path, tmp_path)
+            os.replace(tmp_path, path)
+            self._evict()
+
+    def prefetch(self, keys: Iterable[str]) -> List[str]:
+        """
+        Fetch several artifacts in parallel. Missing keys are skipped.
+        Returns the keys that are now cached.
+        """
+        keys = list(keys)
+
+        def try_fetch(key):
+            try:
+                self.fetch(key)
+                return key
+            except FileNotFoundError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.prefetch_workers) as pool:
+            return [k for k in pool.map(try_fetch, keys) if k]
+
+    def _evict(self) -> None:
+        if not self.max_bytes:
+            return
+        with self._lock:
+            entries = []
+            for dirpath, _, filenames in os.walk(self.cache_dir):
+                for name in filenames:
+                    if name.endswith(".part"):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path in self._pins:
+                    continue  # still counts towards the total
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+def get_storage() -> ArtifactStorage:
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(settings.S3_BUCKET, settings.S3_PREFIX, settings.S3_ENDPOINT_URL)
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(SAVED_MODELS_DIR)
+    raise ValueError(f"Unsupported storage backend: {settings.STORAGE_BACKEND}")
+
+
+storage = get_storage()
+artifact_cache = ArtifactCache(
+    storage,
+    settings.ARTIFACT_CACHE_DIR,
+    settings.ARTIFACT_CACHE_MAX_MB * 1024 * 1024,
+    settings.ARTIFACT_PREFETCH_WORKERS,
+)
@@ -1,21 +1,32 @@
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.metrics import accuracy_score
 from models.logistic import LogisticRegressionModel
 from models.random_forest import RandomForestModel
 from models.neural_net import NeuralNetModel
 from models.base_model import BaseModel
+from models.preprocessor import FeaturePreprocessor
 from sqlalchemy.orm import Session
-from config.settings import SAVED_MODELS_DIR
+from config.settings import NN_EXPORT_TFLITE, MAX_N_ESTIMATORS, ONNX_EXPORT, ONNX_SERVING
+from config.settings import PREVIEW_FRACTIONS, PREVIEW_MIN_ROWS, PREVIEW_TIME_LIMIT_SECONDS
 from services.db_ops import record_model_metadata
-from typing import Tuple, Any
+from services.onnx_serving import export_onnx, load_onnx_model, ONNX_SUFFIX, PREPROCESSOR_SUFFIX
+from services.evaluation import evaluate_holdout, holdout_probabilities, expand_columns
+from services.storage import storage, artifact_cache
+from utils.threads import thread_budget, with_thread_budget
+from utils.budget import TrainingBudget
+from typing import Tuple, Any, Optional
 import pandas as pd
 import numpy as np
 import joblib
 import os
+import tempfile
+import time
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
 
 
+COMPANION_SUFFIXES = (".tflite", ONNX_SUFFIX, PREPROCESSOR_SUFFIX)
+
 # Registry maps model names (from frontend) to their classes
 model_registry = {
     "logisticregression": LogisticRegressionModel,
@@ -33,51 +44,254 @@ def train_model(
     k_fold: int,
     db: Session,
     user_id: int,
-    file_name: str
+    file_name: str,
+    record: bool = True
 ) -> Tuple[Any, float, str]:
+    """
+    Train, evaluate and save a model. With `record` unset, the TrainedModel
+    row is left to the caller (so it can be committed with other changes).
+    """
 
     model_type = model_type.lower()
     is_supported_model(model_type)
 
     model_class = model_registry[model_type]
     model_instance: BaseModel = model_class(params)
+    model_instance.budget = TrainingBudget()
+
+    # Encode labels once so every split and report uses the same class codes
+    labels = pd.Categorical(y)
+    class_names = [str(c) for c in labels.categories]
+    codes = labels.codes.astype(np.int64)
+    model_instance.n_classes = len(class_names)
 
     if k_fold > 1:
         from sklearn.base import clone
 
+        if params.get("n_estimators", 0) > MAX_N_ESTIMATORS:
+            raise ValueError(f"n_estimators must be at most {MAX_N_ESTIMATORS}.")
+
+        estimator_params = {"n_jobs": thread_budget("train"), **params}
         if model_type == "logisticregression":
-            base_estimator = LogisticRegression(**params)
+            base_estimator = LogisticRegression(**estimator_params)
         elif model_type == "randomforest":
-            base_estimator = RandomForestClassifier(**params)
+            base_estimator = RandomForestClassifier(**estimator_params)
         else:
-            base_estimator = model_class(params).model
-        scores = cross_val_score(clone(base_estimator), X, y, cv=k_fold)
-        mean_acc = float(np.mean(scores))
-        model_instance.train(X, y)
-
-        final_file_name = save_model_to_disk(model_instance, file_name, model_type)
-        record_model_metadata(db, user_id, file_name, model_type, final_file_name, mean_acc, params)
+            base_estimator = None  # no sklearn estimator: each fold trains through the model wrapper
+        # Folds run one at a time so the job budget is checked between them.
+        # Each fold fits its own preprocessor on its training rows only, then
+        # predicts probabilities for its held-out rows once; the out-of-fold
+        # probabilities feed both the fold scores and the report.
+        out_of_fold = np.zeros((len(codes), len(class_names)))
+        evaluated = np.zeros(len(codes), dtype=bool)
+        scores = []
+        for train_idx, test_idx in StratifiedKFold(n_splits=k_fold).split(X, codes):
+            if model_instance.budget.exceeded_reason():
+                break
+            fold_preprocessor = FeaturePreprocessor()
+            X_fold_train = fold_preprocessor.fit_transform(X.iloc[train_idx])
+            X_fold_test = fold_preprocessor.transform(X.iloc[test_idx])
+            if base_estimator is not None:
+                fold_estimator = clone(base_estimator).fit(X_fold_train, codes[train_idx])
+                fold_proba = expand_columns(fold_estimator.predict_proba(X_fold_test),
+                                            fold_estimator.classes_, len(class_names))
+            else:
+                fold_model: BaseModel = model_class(params)
+                fold_model.n_classes = len(class_names)
+                fold_model.budget = model_instance.budget
+                fold_model.train(X_fold_train, codes[train_idx])
+                fold_proba = holdout_probabilities(fold_model, X_fold_test, len(class_names))
+            out_of_fold[test_idx] = fold_proba
+            evaluated[test_idx] = True
+            scores.append(float(np.mean(fold_proba.argmax(axis=1) == codes[test_idx])))
+
+        preprocessor = FeaturePreprocessor()
+        X = preprocessor.fit_transform(X)
+        model_instance.preprocessor = preprocessor
+        model_instance.train(X, codes)
+        mean_acc = float(np.mean(scores)) if scores else 0.0
+        model_instance.training_info = {**(model_instance.training_info or {}), "folds_completed": len(scores)}
+        if scores:
+            model_instance.evaluation = evaluate_holdout(codes[evaluated], out_of_fold[evaluated], class_names)
+
+        final_file_name = save_model_to_disk(model_instance, file_name, model_type, X)
+        if record:
+            record_model_metadata(db, user_id, file_name, model_type, final_file_name, mean_acc, params,
+                                  model_instance.evaluation)
 
         return model_instance, mean_acc, final_file_name
 
     else:
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size)
-        y_train = pd.Categorical(y_train).codes.astype(np.int64)
-        y_test = pd.Categorical(y_test).codes.astype(np.int64)
+        X_train, X_test, y_train, y_test = _split(X, codes, test_size=test_size)
 
-        model_instance.train(X_train, y_train)
+        preprocessor = FeaturePreprocessor()
+        X_train = preprocessor.fit_transform(X_train)
+        X_test = preprocessor.transform(X_test)
+        model_instance.preprocessor = preprocessor
 
-        y_pred = model_instance.model.predict(X_test)
-        if model_type == "neuralnet":
-            y_pred = (y_pred > 0.5).astype(int).flatten()
+        model_instance.train(X_train, y_train)
+        proba = holdout_probabilities(model_instance, X_test, len(class_names))
 
-        acc = accuracy_score(y_test, y_pred)
-        final_file_name = save_model_to_disk(model_instance, file_name, model_type)
-        record_model_metadata(db, user_id, file_name, model_type, final_file_name, acc, params)
+        model_instance.evaluation = evaluate_holdout(y_test, proba, class_names)
+        acc = model_instance.evaluation["accuracy"]
+        final_file_name = save_model_to_disk(model_instance, file_name, model_type, X_test)
+        if record:
+            record_model_metadata(db, user_id, file_name, model_type, final_file_name, acc, params,
+                                  model_instance.evaluation)
 
         return model_instance, acc, final_file_name
 
 
+def preview_model(
+    model_type: str,
+    X: pd.DataFrame,
+    y: pd.Series,
+    params: dict,
+    test_size: float,
+    db: Session,
+    user_id: int,
+    file_name: str,
+    save: bool = False
+) -> Tuple[Any, dict, Optional[str]]:
+    """
+    Quick-fit preview: train on stratified subsamples of increasing size
+    (PREVIEW_FRACTIONS of the training split), score each on the same
+    holdout set, and extrapolate a learning curve to the full training size.
+
+    Stops early once the next fit would not fit in PREVIEW_TIME_LIMIT_SECONDS
+    (fit time is assumed to grow linearly with rows). Nothing is persisted
+    unless `save` is set, in which case the largest preview model is saved.
+    """
+    model_type = model_type.lower()
+    is_supported_model(model_type)
+    if params.get("n_estimators", 0) > MAX_N_ESTIMATORS:
+        raise ValueError(f"n_estimators must be at most {MAX_N_ESTIMATORS}.")
+
+    labels = pd.Categorical(y)
+    y = pd.Series(labels.codes.astype(np.int64), index=y.index)
+    X_train, X_test, y_train, y_test = _split(X, y, test_size=test_size)
+
+    budget = TrainingBudget(max_seconds=PREVIEW_TIME_LIMIT_SECONDS)
+    points = []
+    model_instance = None
+    stopped_reason = None
+
+    for fraction in PREVIEW_FRACTIONS:
+        n_rows = min(len(X_train), max(PREVIEW_MIN_ROWS, int(round(fraction * len(X_train)))))
+        if points and n_rows <= points[-1]["rows"]:
+            continue
+        if points:
+            projected = points[-1]["seconds"] * n_rows / points[-1]["rows"]
+            if budget.elapsed + projected > PREVIEW_TIME_LIMIT_SECONDS:
+                stopped_reason = f"next fit would exceed the {PREVIEW_TIME_LIMIT_SECONDS}s preview budget"
+                break
+
+        if n_rows < len(X_train):
+            X_sub, _, y_sub, _ = _split(X_train, y_train, train_size=n_rows)
+            X_sub, y_sub = _with_every_class(X_sub, y_sub, X_train, y_train)
+        else:
+            X_sub, y_sub = X_train, y_train
+
+        started = time.monotonic()
+        candidate: BaseModel = model_registry[model_type](params)
+        candidate.n_classes = len(labels.categories)
+        candidate.budget = TrainingBudget(max_seconds=max(1.0, PREVIEW_TIME_LIMIT_SECONDS - budget.elapsed))
+        preprocessor = FeaturePreprocessor()
+        X_sub = preprocessor.fit_transform(X_sub)
+        candidate.preprocessor = preprocessor
+
+        candidate.train(X_sub, y_sub.to_numpy())
+        y_pred = candidate.predict(preprocessor.transform(X_test))
+
+        model_instance = candidate
+        points.append({
+            "fraction": round(n_rows / len(X_train), 4),
+            "rows": n_rows,
+            "accuracy": float(accuracy_score(y_test, y_pred)),
+            "seconds": round(time.monotonic() - started, 3),
+        })
+        if budget.exceeded_reason():
+            stopped_reason = budget.exceeded_reason()
+            break
+
+    preview = {
+        "points": points,
+        "full_rows": len(X_train),
+        "estimated_full_accuracy": extrapolate_learning_curve(points, len(X_train)),
+        "elapsed_seconds": round(budget.elapsed, 3),
+        "stopped_reason": stopped_reason,
+    }
+    model_instance.training_info = {**(model_instance.training_info or {}), "preview": True}
+
+    final_file_name = None
+    if save:
+        sample = model_instance.preprocessor.transform(X_test)
+        final_file_name = save_model_to_disk(model_instance, file_name, model_type, sample)
+        record_model_metadata(db, user_id, file_name, model_type, final_file_name, points[-1]["accuracy"], params)
+
+    return model_instance, preview, final_file_name
+
+
+def _split(X, y, **kwargs):
+    """
+    Stratified train_test_split, falling back to a plain random split when
+    some class is too small to stratify.
+    """
+    try:
+        return train_test_split(X, y, stratify=y, **kwargs)
+    except ValueError:
+        return train_test_split(X, y, **kwargs)
+
+
+def _with_every_class(X_sub, y_sub, X, y):
+    """
+    Add one row of each class of `y` that the subsample `y_sub` lacks, so
+    small preview fits still see every class (stratification can drop rare
+    ones, and most estimators refuse a single class).
+    """
+    labels = y.to_numpy()
+    missing = np.setdiff1d(np.unique(labels), y_sub.to_numpy())
+    if not missing.size:
+        return X_sub, y_sub
+    candidates = np.flatnonzero(np.isin(labels, missing))
+    _, first = np.unique(labels[candidates], return_index=True)
+    rows = candidates[first]
+    return pd.concat([X_sub, X.iloc[rows]]), pd.concat([y_sub, y.iloc[rows]])
+
+
+def extrapolate_learning_curve(points: list, n_rows: int) -> Optional[float]:
+    """
+    Fit the inverse power law acc(n) = a - b * n^-c to the preview points and
+    evaluate it at `n_rows`. With fewer than three points (or if the fit
+    fails) the last observed accuracy is returned.
+    """
+    if not points:
+        return None
+    last = points[-1]["accuracy"]
+    if len(points) < 3:
+        return last
+
+    import warnings
+    from scipy.optimize import curve_fit, OptimizeWarning
+
+    sizes = np.array([p["rows"] for p in points], dtype=np.float64)
+    accs = np.array([p["accuracy"] for p in points], dtype=np.float64)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", OptimizeWarning)  # 3 points leave no covariance estimate
+            (a, b, c), _ = curve_fit(
+                lambda n, a, b, c: a - b * n ** -c,
+                sizes, accs,
+                p0=(min(1.0, accs.max() + 0.01), 1.0, 0.5),
+                bounds=([0.0, 0.0, 0.0], [1.0, np.inf, 2.0]),
+                maxfev=2000,
+            )
+    except (RuntimeError, ValueError):
+        return last
+    estimate = float(a - b * n_rows ** -c)
+    return float(np.clip(estimate, 0.0, 1.0)) if np.isfinite(estimate) else last
+
+
 def make_prediction(model: BaseModel,
                     model_name: str,
                     input_data: list,
@@ -85,52 +299,129 @@ def make_prediction(model: BaseModel,
 
     is_supported_model(model_name)
 
-    if return_proba and hasattr(model.model, "predict_proba"):
-        probs = model.model.predict_proba(input_data)
-        return probs.tolist()
+    model = with_thread_budget(model, "predict")
+    input_data = model.prepare_input(input_data)
+
+    if return_proba:
+        try:
+            return model.predict_proba(input_data)
+        except NotImplementedError:
+            pass
 
     return model.predict(input_data)
 
 
-def save_model_to_disk(model: BaseModel, model_name: str, model_type: str) -> str:
+def save_model_to_disk(model: BaseModel, model_name: str, model_type: str, sample: Any = None) -> str:
     """
-    Saves the model using the provided file_name and correct extension.
-    Returns final saved filename.
+    Saves the model (and its companion files) to artifact storage under
+    the provided file_name with the correct extension.
+    With ONNX_EXPORT, an ONNX copy is added if it passes the parity check
+    on `sample` (preprocessed rows, e.g. the test split).
+    Returns the storage key of the main artifact.
     """
-    os.makedirs(SAVED_MODELS_DIR, exist_ok=True)
     ext = "joblib" if model_type == "logisticregression" or model_type == "randomforest" else "keras"
+    if ext == "keras" and model.model is None and getattr(model, "tflite_content", None):
+        ext = "tflite"  # TFLite-only network (e.g. a quantized, compacted model)
     final_file_name = f"{model_name}.{ext}"
-    save_path = os.path.join(SAVED_MODELS_DIR, final_file_name)
 
-    if ext == "joblib":
-        joblib.dump(model.model, save_path)
-    else:
-        model.model.save(save_path)
+    with tempfile.TemporaryDirectory() as staging_dir:
+        save_path = os.path.join(staging_dir, final_file_name)
 
-    print(f"[INFO] Model saved to: {save_path}")
+        if ext == "joblib":
+            joblib.dump({"model": model.model, "preprocessor": model.preprocessor}, save_path)
+        else:
+            if ext == "tflite":
+                with open(save_path, "wb") as f:
+                    f.write(model.tflite_content)
+            else:
+                model.model.save(save_path)
+                if NN_EXPORT_TFLITE:
+                    model.export_tflite(os.path.join(staging_dir, f"{model_name}.tflite"))
+            if model.preprocessor is not None:
+                joblib.dump(model.preprocessor, os.path.join(staging_dir, f"{model_name}{PREPROCESSOR_SUFFIX}"))
+
+        onnx_content = export_onnx(model, sample) if ONNX_EXPORT else None
+        if onnx_content is not None:
+            with open(os.path.join(staging_dir, f"{model_name}{ONNX_SUFFIX}"), "wb") as f:
+                f.write(onnx_content)
+            preprocessor_path = os.path.join(staging_dir, f"{model_name}{PREPROCESSOR_SUFFIX}")
+            if model.preprocessor is not None and not os.path.exists(preprocessor_path):
+                # Lets the ONNX copy be served without unpickling the sklearn estimator
+                joblib.dump(model.preprocessor, preprocessor_path)
+
+        for key in artifact_keys(final_file_name):
+            local_path = os.path.join(staging_dir, key)
+            if os.path.exists(local_path):
+                digest = storage.put(key, local_path)
+                artifact_cache.add(key, local_path, digest)
+            elif key != final_file_name and storage.exists(key):
+                # Left over from an earlier model saved under this name; an
+                # old .onnx copy would otherwise be served instead of this model
+                storage.delete(key)
+
+    print(f"[INFO] Model saved to storage key: {final_file_name}")
     return final_file_name
 
 
-def load_model_from_disk(model_type: str, file_name: str) -> BaseModel:
+def load_model_from_disk(model_type: str, file_name: str, native: bool = False) -> BaseModel:
+    """
+    Load a model by storage key, reading through the local artifact cache.
+    Companion files are fetched in parallel with the main artifact.
+
+    With ONNX_SERVING, a model that has a parity-checked ONNX copy is served
+    through onnxruntime, and with NN_EXPORT_TFLITE a network is served from
+    its TFLite copy; pass `native=True` to get the sklearn/Keras model
+    (e.g. to modify it).
+    """
     is_supported_model(model_type.lower())
 
+    if ONNX_SERVING and not native:
+        onnx_model = load_onnx_model(file_name)
+        if onnx_model is not None:
+            return onnx_model
+
     model_class = model_registry[model_type.lower()]
     model_instance: BaseModel = model_class()
 
-    path = os.path.join(SAVED_MODELS_DIR, file_name)
+    cached = set(artifact_cache.prefetch(artifact_keys(file_name)))
+    if file_name not in cached:
+        raise FileNotFoundError(f"No saved model found at {file_name}")
+    with artifact_cache.pinned(file_name) as path:
+        if file_name.endswith(".joblib"):
+            artifact = joblib.load(path)
+            if isinstance(artifact, dict):  # model saved with its preprocessor
+                model_instance.model = artifact["model"]
+                model_instance.preprocessor = artifact.get("preprocessor")
+            else:
+                model_instance.model = artifact
+        elif file_name.endswith(".tflite"):
+            base, _ = os.path.splitext(file_name)
+            if base + PREPROCESSOR_SUFFIX in cached:
+                model_instance.preprocessor = artifact_cache.load(base + PREPROCESSOR_SUFFIX, joblib.load)
+            model_instance.load_tflite(path)
+        elif file_name.endswith(".keras"):
+            base, _ = os.path.splitext(file_name)
+            if base + PREPROCESSOR_SUFFIX in cached:
+                model_instance.preprocessor = artifact_cache.load(base + PREPROCESSOR_SUFFIX, joblib.load)
+            if NN_EXPORT_TFLITE and not native and base + ".tflite" in cached:
+                artifact_cache.load(base + ".tflite", model_instance.load_tflite)
+            else:
+                from tensorflow.keras.models import load_model
+                model_instance.model = load_model(path)
+        else:
+            raise ValueError(f"Unsupported file extension in {file_name}")
 
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"No saved model found at {path}")
+    return model_instance
 
-    if file_name.endswith(".joblib"):
-        model_instance.model = joblib.load(path)
-    elif file_name.endswith(".keras"):
-        from tensorflow.keras.models import load_model
-        model_instance.model = load_model(path)
-    else:
-        raise ValueError(f"Unsupported file extension in {file_name}")
 
-    return model_instance
+def artifact_keys(key: str) -> list:
+    """
+    Storage key of a model plus the keys of its companion files
+    (TFLite and ONNX copies, preprocessor).
+    """
+    key = os.path.basename(key)
+    base, _ = os.path.splitext(key)
+    return list(dict.fromkeys([key] + [base + suffix for suffix in COMPANION_SUFFIXES]))
 
 
 def is_supported_model(model_name: str):
@@ -0,0 +1,418 @@
+import fcntl
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Optional
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+from config.settings import (
+    UPLOAD_DIR,
+    UPLOAD_MAX_CHUNK_MB,
+    UPLOAD_WRITE_BUFFER_KB,
+    UPLOAD_EXPIRE_HOURS,
+    UPLOAD_SWEEP_INTERVAL,
+    UPLOAD_CACHED_DATASETS,
+)
+from services.storage import file_sha256
+from utils.data import read_csv, decompress_stream, PARQUET_MAGIC
+
+
+class UploadConflict(Exception):
+    """
+    A chunk was sent for the wrong offset; carries the offset the server expects.
+    """
+
+    def __init__(self, offset: int):
+        super().__init__(f"Expected a chunk at offset {offset}.")
+        self.offset = offset
+
+
+class _GrowingFile(io.RawIOBase):
+    """
+    Read-only view of an upload that is still being written. Reads past the
+    bytes received so far block until more arrive or the upload is finalized.
+    """
+
+    def __init__(self, live: "_LiveUpload"):
+        self.live = live
+        self.f = open(live.data_path, "rb")
+        self.pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        with self.live.cond:
+            while self.pos >= self.live.size and not self.live.complete and not self.live.aborted:
+                self.live.cond.wait()
+            if self.live.aborted:
+                raise IOError("Upload was aborted")
+            available = self.live.size - self.pos
+        if available <= 0:
+            return 0
+        self.f.seek(self.pos)
+        data = self.f.read(min(len(buffer), available))
+        buffer[:len(data)] = data
+        self.pos += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        self.f.close()
+        super().close()
+
+
+class _LiveUpload:
+    """
+    In-process state of an upload: a background thread parses CSV with
+    Arrow's streaming reader while chunks are still arriving, so the header
+    is validated early and most of the parsing is done by finalize time.
+    """
+
+    def __init__(self, upload_id: str, size: int):
+        self.upload_id = upload_id
+        self.data_path = _data_path(upload_id)
+        self.size = size
+        self.complete = False
+        self.aborted = False
+        self.cond = threading.Condition()
+        self.lock = threading.Lock()  # serializes chunk writes
+        self.columns = None
+        self.error = None
+        self.table = None
+        self.consumed = 0  # bytes read by the streaming parser
+        self.parsed = threading.Event()
+        self.thread = None
+
+    def grew(self, size: int) -> None:
+        with self.cond:
+            self.size = size
+            self.cond.notify_all()
+        if self.thread is None and size >= len(PARQUET_MAGIC):
+            self._start_parser()
+
+    def finish(self) -> None:
+        with self.cond:
+            # Chunks written by other worker processes never called grew()
+            self.size = os.path.getsize(self.data_path)
+            self.complete = True
+            self.cond.notify_all()
+        if self.thread is None:
+            self._start_parser()
+
+    def abort(self) -> None:
+        with self.cond:
+            self.aborted = True
+            self.cond.notify_all()
+
+    def _start_parser(self) -> None:
+        with open(self.data_path, "rb") as f:
+            magic = f.read(len(PARQUET_MAGIC))
+        if magic == PARQUET_MAGIC:
+            self.parsed.set()  # Parquet needs its footer; parsed on first use instead
+            self.thread = False
+            return
+        self.thread = threading.Thread(
+            target=self._parse, args=(magic,), daemon=True, name=f"upload-parse-{self.upload_id}"
+        )
+        self.thread.start()
+
+    def _parse(self, magic: bytes) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pacsv
+
+            with _GrowingFile(self) as raw:
+                stream = decompress_stream(raw, magic)
+                reader = pacsv.open_csv(stream, read_options=pacsv.ReadOptions(use_threads=True))
+                self.columns = [c.strip() for c in reader.schema.names]
+                batches = list(reader)
+                self.consumed = raw.pos
+            self.table = pa.Table.from_batches(batches, schema=reader.schema)
+        except Exception as e:
+            # Type inference can fail on later blocks; finalize re-parses the whole file
+            self.error = str(e)
+        finally:
+            self.parsed.set()
+
+    def dataframe(self) -> Optional[pd.DataFrame]:
+        """
+        The streamed parse result, or None if the upload has to be parsed from
+        disk (the parse failed or did not read the whole file).
+        """
+        self.parsed.wait()
+        if self.table is None or self.consumed != self.size:
+            return None
+        df = self.table.to_pandas()
+        df.columns = df.columns.str.strip()
+        return df
+
+
+_live = {}  # upload_id -> _LiveUpload
+_datasets = OrderedDict()  # upload_id -> parsed DataFrame of a finalized upload
+_registry_lock = threading.Lock()
+
+
+def _upload_dir(upload_id: str) -> str:
+    if not upload_id or not all(c in "0123456789abcdef" for c in upload_id):
+        raise FileNotFoundError("Upload not found")
+    return os.path.join(UPLOAD_DIR, upload_id)
+
+
+def _data_path(upload_id: str) -> str:
+    return os.path.join(_upload_dir(upload_id), "data")
+
+
+def _meta_path(upload_id: str) -> str:
+    return os.path.join(_upload_dir(upload_id), "meta.json")
+
+
+def _read_meta(upload_id: str) -> dict:
+    try:
+        with open(_meta_path(upload_id)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise FileNotFoundError("Upload not found")
+
+
+def _update_meta(upload_id: str, **changes) -> dict:
+    meta = {**_read_meta(upload_id), **changes}
+    tmp_path = f"{_meta_path(upload_id)}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, _meta_path(upload_id))
+    return meta
+
+
+def _get_live(upload_id: str) -> _LiveUpload:
+    with _registry_lock:
+        live = _live.get(upload_id)
+        if live is None:
+            # Upload resumed after a restart (or on another worker process)
+            live = _live[upload_id] = _LiveUpload(upload_id, os.path.getsize(_data_path(upload_id)))
+        return live
+
+
+def get_upload(upload_id: str, user) -> dict:
+    """
+    Upload metadata, if it belongs to `user` (admins may see any upload).
+    """
+    meta = _read_meta(upload_id)
+    if meta["user_id"] != user.id and user.role != "admin":
+        raise FileNotFoundError("Upload not found")
+    meta["offset"] = os.path.getsize(_data_path(upload_id))
+    live = _live.get(upload_id)
+    if live is not None and meta["status"] == "uploading":
+        meta["columns"] = live.columns  # known as soon as the header has been parsed
+        if live.error:
+            meta["parse_warning"] = live.error
+    return meta
+
+
+def create_upload(user, filename: str, total_size: Optional[int], sha256: Optional[str]) -> dict:
+    remove_expired_uploads()
+    upload_id = uuid.uuid4().hex
+    os.makedirs(_upload_dir(upload_id))
+    open(_data_path(upload_id), "wb").close()
+    meta = {
+        "upload_id": upload_id,
+        "user_id": user.id,
+        "filename": filename,
+        "total_size": total_size,
+        "sha256": sha256,
+        "status": "uploading",
+        "columns": None,
+        "rows": None,
+        "created_at": time.time(),
+    }
+    with open(_meta_path(upload_id), "w") as f:
+        json.dump(meta, f)
+    return {**meta, "offset": 0}
+
+
+async def write_chunk(upload_id: str, user, offset: int, chunks: AsyncIterator[bytes],
+                      checksum: Optional[str]) -> int:
+    """
+    Append a chunk at `offset`. The chunk is streamed to disk and its
+    sha256 compared with `checksum`; on a mismatch it is discarded. Returns
+    the new offset. A chunk for any other offset than the current end of the
+    file raises UploadConflict, so clients can resume from the right place.
+    """
+    meta = get_upload(upload_id, user)
+    if meta["status"] != "uploading":
+        raise ValueError("Upload is already finalized.")
+
+    live = _get_live(upload_id)
+    if not live.lock.acquire(blocking=False):
+        raise UploadConflict(meta["offset"])  # another chunk is being written
+    try:
+        path = _data_path(upload_id)
+        with open(path, "r+b") as f:
+            # The in-process lock does not cover other API worker processes
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadConflict(os.path.getsize(path))
+            current = os.fstat(f.fileno()).st_size
+            if offset != current:
+                raise UploadConflict(current)
+
+            digest = hashlib.sha256()
+            written = 0
+            limit = UPLOAD_MAX_CHUNK_MB * 1024 * 1024
+            pending, pending_bytes = [], 0
+            f.seek(offset)
+            try:
+                # Disk writes and hashing run in the threadpool, in batches
+                # of UPLOAD_WRITE_BUFFER_KB, to keep the event loop free
+                async for piece in chunks:
+                    written += len(piece)
+                    if written > limit:
+                        raise ValueError(f"Chunks may be at most {UPLOAD_MAX_CHUNK_MB} MB.")
+                    pending.append(piece)
+                    pending_bytes += len(piece)
+                    if pending_bytes >= UPLOAD_WRITE_BUFFER_KB * 1024:
+                        await run_in_threadpool(_write_pieces, f, digest, pending)
+                        pending, pending_bytes = [], 0
+                await run_in_threadpool(_write_pieces, f, digest, pending)
+                if checksum and digest.hexdigest() != checksum.lower():
+                    raise ValueError("Chunk checksum mismatch; resend it.")
+                if meta["total_size"] is not None and offset + written > meta["total_size"]:
+                    raise ValueError("Chunk extends past the declared total size.")
+            except BaseException:
+                f.truncate(offset)  # drop the partial chunk
+                raise
+            await run_in_threadpool(_sync, f)
+
+        live.grew(offset + written)
+        _update_meta(upload_id)  # refresh the modification time used for expiry
+        return offset + written
+    finally:
+        live.lock.release()
+
+
+def _write_pieces(f, digest, pieces: list) -> None:
+    for piece in pieces:
+        digest.update(piece)
+        f.write(piece)
+
+
+def _sync(f) -> None:
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def finalize_upload(upload_id: str, user, sha256: Optional[str]) -> dict:
+    """
+    Check the assembled file's size and checksum, finish parsing it and
+    keep the result for /fit/. Returns the upload's metadata.
+    """
+    meta = get_upload(upload_id, user)
+    if meta["status"] == "complete":
+        return meta
+
+    size = meta["offset"]
+    if meta["total_size"] is not None and size != meta["total_size"]:
+        raise ValueError(f"Upload is incomplete: received {size} of {meta['total_size']} bytes.")
+    expected = sha256 or meta["sha256"]
+    if expected and file_sha256(_data_path(upload_id)) != expected.lower():
+        raise ValueError("Upload checksum mismatch.")
+
+    live = _get_live(upload_id)
+    live.finish()
+    df = live.dataframe()
+    if df is None:
+        df = read_csv(_data_path(upload_id))
+    _cache_dataset(upload_id, df)
+
+    with _registry_lock:
+        _live.pop(upload_id, None)
+    return _update_meta(upload_id, status="complete", columns=list(map(str, df.columns)), rows=len(df))
+
+
+def load_upload_dataset(upload_id: str, user) -> pd.DataFrame:
+    """
+    DataFrame of a finalized upload, for use as a training dataset.
+    """
+    meta = get_upload(upload_id, user)
+    if meta["status"] != "complete":
+        raise ValueError("Upload is not finalized yet.")
+
+    with _registry_lock:
+        if upload_id in _datasets:
+            _datasets.move_to_end(upload_id)
+            return _datasets[upload_id]
+    df = read_csv(_data_path(upload_id))
+    _cache_dataset(upload_id, df)
+    return df
+
+
+def _cache_dataset(upload_id: str, df: pd.DataFrame) -> None:
+    with _registry_lock:
+        _datasets[upload_id] = df
+        while len(_datasets) > UPLOAD_CACHED_DATASETS:
+            _datasets.popitem(last=False)
+
+
+def delete_upload(upload_id: str, user) -> None:
+    get_upload(upload_id, user)
+    _forget(upload_id)
+
+
+def _forget(upload_id: str) -> None:
+    with _registry_lock:
+        live = _live.pop(upload_id, None)
+        _datasets.pop(upload_id, None)
+    if live is not None:
+        live.abort()
+    shutil.rmtree(_upload_dir(upload_id), ignore_errors=True)
+
+
+def remove_expired_uploads() -> None:
+    """
+    Remove uploads untouched for UPLOAD_EXPIRE_HOURS. Removing one aborts its
+    parser thread, which would otherwise wait for more data forever; live
+    uploads whose files another worker process removed are aborted too.
+    """
+    with _registry_lock:
+        orphaned = [upload_id for upload_id in _live if not os.path.isdir(_upload_dir(upload_id))]
+    for upload_id in orphaned:
+        _forget(upload_id)
+
+    if not os.path.isdir(UPLOAD_DIR):
+        return
+    cutoff = time.time() - UPLOAD_EXPIRE_HOURS * 3600
+    for upload_id in os.listdir(UPLOAD_DIR):
+        try:
+            if os.path.getmtime(_meta_path(upload_id)) < cutoff:
+                _forget(upload_id)
+        except (OSError, FileNotFoundError):
+            continue
+
+
+_sweeper_stopped = threading.Event()
+
+
+def start_upload_sweeper() -> None:
+    """
+    Sweep expired uploads every UPLOAD_SWEEP_INTERVAL seconds in a background
+    thread, so abandoned uploads are cleaned up even when no new ones arrive.
+    """
+    def sweep():
+        while not _sweeper_stopped.wait(UPLOAD_SWEEP_INTERVAL):
+            try:
+                remove_expired_uploads()
+            except Exception as e:
+                print(f"[WARN] Upload sweep failed: {e}")
+
+    _sweeper_stopped.clear()
+    threading.Thread(target=sweep, daemon=True, name="upload-sweeper").start()
+
+
+def stop_upload_sweeper() -> None:
+    _sweeper_stopped.set()
@@ -0,0 +1,68 @@
+"""
+Standalone training worker. Run any number of these, on any host that can
+reach the database and artifact storage:
+
+    python training_worker.py            # run until SIGTERM/SIGINT
+    python training_worker.py --once     # process queued jobs, then exit
+
+Each worker claims jobs from the training_jobs table, trains them with
+services.trainer.train_model and records which worker ran them.
+"""
+import argparse
+import os
+import signal
+import socket
+import threading
+from config.db import SessionLocal
+from config.settings import JOB_POLL_SECONDS
+from services.jobs import claim_next_job, requeue_stale_jobs, run_claimed_job
+from utils.threads import configure_process_threads, thread_budget
+
+stopping = threading.Event()
+
+
+def handle_signal(signum, frame):
+    print(f"[INFO] Received signal {signum}; finishing the current job before exiting")
+    stopping.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a training worker.")
+    parser.add_argument("--once", action="store_true", help="Exit once the queue is empty.")
+    args = parser.parse_args()
+
+    configure_process_threads("train")
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"[INFO] Training worker {worker_id} started (train threads: {thread_budget('train')})")
+
+    while not stopping.is_set():
+        db = SessionLocal()
+        try:
+            requeued = requeue_stale_jobs(db)
+            if requeued:
+                print(f"[INFO] Requeued {requeued} stale job(s)")
+
+            job = claim_next_job(db, worker_id)
+            if job is None:
+                if args.once:
+                    break
+                stopping.wait(JOB_POLL_SECONDS)
+                continue
+
+            print(f"[INFO] Running job {job.id} ({job.model_type}, attempt {job.attempts})")
+            run_claimed_job(db, job, worker_id)
+            print(f"[INFO] Job {job.id} {job.status}" + (f": {job.error}" if job.error else ""))
+        except Exception as e:
+            print(f"[ERROR] Training worker loop failed: {e}")
+            stopping.wait(JOB_POLL_SECONDS)
+        finally:
+            db.close()
+
+    print(f"[INFO] Training worker {worker_id} stopped")
+
+
+if __name__ == "__main__":
+    main()
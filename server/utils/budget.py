@@ -0,0 +1,52 @@
+import os
+import time
+import resource
+from typing import Optional
+from config.settings import settings
+from utils.threads import dedicated_process_kind
+
+
+def current_rss_mb() -> float:
+    """
+    Resident memory of this process in MB (falls back to peak RSS off Linux).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class TrainingBudget:
+    """
+    Wall-clock and memory budget for a single training job.
+
+    Memory is measured as growth in resident memory since the job started.
+    RSS belongs to the whole process, so the memory limit is only enforced
+    by default in the training worker, which runs one job at a time; in the
+    API process, concurrent requests would be charged to whichever job
+    happened to be running. A limit of 0 disables that check.
+    """
+
+    def __init__(self, max_seconds: float = None, max_memory_mb: float = None):
+        self.max_seconds = settings.TRAIN_TIME_LIMIT_SECONDS if max_seconds is None else max_seconds
+        if max_memory_mb is None:
+            max_memory_mb = settings.TRAIN_MEMORY_LIMIT_MB if dedicated_process_kind() == "train" else 0
+        self.max_memory_mb = max_memory_mb
+        self.started = time.monotonic()
+        self.rss_start = current_rss_mb()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def exceeded_reason(self) -> Optional[str]:
+        """
+        Return why the budget is used up, or None while there is room left.
+        """
+        if self.max_seconds and self.elapsed > self.max_seconds:
+            return f"time limit of {self.max_seconds}s reached"
+        if self.max_memory_mb and current_rss_mb() - self.rss_start > self.max_memory_mb:
+            return f"memory limit of {self.max_memory_mb} MB reached"
+        return None
@@ -1,20 +1,117 @@
 import pandas as pd
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from typing import BinaryIO, List, Optional
+import gzip
 import io
 
-async def load_csv_data(file: UploadFile) -> pd.DataFrame:
+# Leading bytes used to recognise uploads regardless of file name
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+PARQUET_MAGIC = b"PAR1"
+
+
+async def load_csv_data(file: UploadFile, columns: Optional[List[str]] = None) -> pd.DataFrame:
     """
-    Reads and parses a CSV file uploaded by the user.
+    Reads and parses a tabular file uploaded by the user: CSV (optionally
+    gzip or zstd compressed) or Parquet, detected from its leading bytes.
+    If `columns` is given, only those columns are parsed when present.
 
     Returns:
     - pandas DataFrame
     """
+    await file.seek(0)
+    return await run_in_threadpool(read_csv, file.file, columns)
+
+
+def read_csv(source, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Parses a CSV (plain, gzip or zstd) or Parquet file from a path or a
+    seekable binary file object.
+
+    Returns:
+    - pandas DataFrame
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return read_csv(f, columns)
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    start = source.tell()
+    magic = source.read(4)
+    source.seek(start)
+
     try:
-        content = await file.read()
-        df = pd.read_csv(io.BytesIO(content), encoding="utf-8")
+        if magic == PARQUET_MAGIC:
+            df = _read_parquet(source, columns)
+        else:
+            df = _read_csv_stream(decompress_stream(source, magic), columns)
         df.columns = df.columns.str.strip()  # Optional: clean column names
+        if columns and not set(columns) <= set(df.columns):
+            # Projection missed (e.g. padded header names); parse everything instead
+            source.seek(start)
+            return read_csv(source)
         return df
     except UnicodeDecodeError:
         raise ValueError("File encoding is not UTF-8. Please upload a UTF-8 encoded CSV.")
+    except KeyError as e:
+        if not columns:
+            raise ValueError(f"Failed to read CSV: {str(e)}")
+        source.seek(start)  # a projected column is missing from the header
+        return read_csv(source)
     except Exception as e:
         raise ValueError(f"Failed to read CSV: {str(e)}")
+
+
+def decompress_stream(source: BinaryIO, magic: bytes) -> BinaryIO:
+    """
+    Wrap a compressed upload in a streaming decompressor, so the file is
+    never decompressed into memory as a whole.
+    """
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=source, mode="rb")
+    if magic == ZSTD_MAGIC:
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd-compressed uploads require the 'zstandard' package on the server.")
+        return zstandard.ZstdDecompressor().stream_reader(source, closefd=False)
+    return source
+
+
+def _read_csv_stream(stream: BinaryIO, columns: Optional[List[str]]) -> pd.DataFrame:
+    """
+    Parse CSV with Arrow's multithreaded reader (projected to `columns`),
+    falling back to the pandas C parser if pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+    except ImportError:
+        return pd.read_csv(stream, encoding="utf-8")
+
+    convert_options = pacsv.ConvertOptions(include_columns=columns or [])
+    try:
+        table = pacsv.read_csv(
+            stream,
+            read_options=pacsv.ReadOptions(use_threads=True),
+            convert_options=convert_options,
+        )
+    except pa.ArrowInvalid as e:
+        if "UTF8" in str(e) or "utf8" in str(e).lower():
+            raise UnicodeDecodeError("utf-8", b"", 0, 1, str(e))
+        raise
+    return table.to_pandas()
+
+
+def _read_parquet(source: BinaryIO, columns: Optional[List[str]]) -> pd.DataFrame:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet uploads require the 'pyarrow' package on the server.")
+
+    parquet = pq.ParquetFile(source)
+    if columns:
+        columns = [c for c in columns if c in parquet.schema_arrow.names]
+    return parquet.read(columns=columns or None, use_threads=True).to_pandas()
@@ -0,0 +1,122 @@
+import copy
+import os
+from typing import Optional
+from threadpoolctl import threadpool_limits, threadpool_info
+from config.settings import settings
+
+_process_kind = None  # "train" / "predict" in a dedicated worker process, None in the API process
+
+
+def _threads(n: int) -> int:
+    return n if n > 0 else (os.cpu_count() or 1)
+
+
+def api_thread_budget() -> int:
+    """
+    Number of CPU threads the API process may use in total.
+    """
+    return _threads(settings.API_THREADS)
+
+
+def thread_budget(kind: str) -> int:
+    """
+    Number of CPU threads a worker may use for `kind` ("train" or "predict").
+    In the API process this is further capped by its own budget.
+    """
+    n = _threads(settings.TRAIN_THREADS if kind == "train" else settings.PREDICT_THREADS)
+    if _process_kind is None:
+        n = min(n, api_thread_budget())
+    return n
+
+
+def dedicated_process_kind() -> Optional[str]:
+    """
+    The kind of work this process is dedicated to, or None in the API
+    process (which both trains and predicts).
+    """
+    return _process_kind
+
+
+def configure_process_threads(kind: str) -> None:
+    """
+    Size a process that only does one kind of work (the training worker or
+    an inference worker): BLAS/OpenMP pools are capped to the budget for
+    `kind` for the life of the process, and TensorFlow gets its own budget.
+
+    Call this after scikit-learn/numpy are imported: only libraries already
+    loaded are capped.
+    """
+    global _process_kind
+    _process_kind = kind
+    threadpool_limits(limits=thread_budget(kind))
+    configure_tensorflow_threads(kind)
+
+
+def configure_api_threads() -> None:
+    """
+    Size the API process, which trains and predicts in-process: BLAS/OpenMP
+    pools and TensorFlow are capped to API_THREADS for the life of the
+    process, and each call's `n_jobs` stays within it (see thread_budget).
+    Call this after scikit-learn/numpy are imported.
+    """
+    threadpool_limits(limits=api_thread_budget())
+    configure_tensorflow_threads()
+
+
+def with_thread_budget(model, kind: str):
+    """
+    `model` with its estimator's `n_jobs` set to the budget for `kind`.
+
+    The loaded model is shared between requests, so it is never modified: a
+    shallow copy (sharing the fitted trees and weights) is returned instead.
+    """
+    estimator = getattr(model, "model", None)
+    n = thread_budget(kind)
+    if not hasattr(estimator, "n_jobs") or estimator.n_jobs == n:
+        return model
+    scoped = copy.copy(model)
+    scoped.model = copy.copy(estimator)
+    scoped.model.n_jobs = n
+    return scoped
+
+
+def tensorflow_thread_budget(kind: Optional[str] = None) -> int:
+    """
+    TensorFlow intra-op threads: TF_INTRA_OP_THREADS if set, otherwise the
+    budget of the process's kind (API_THREADS in the API process).
+    """
+    if settings.TF_INTRA_OP_THREADS > 0:
+        return settings.TF_INTRA_OP_THREADS
+    if kind is not None:
+        return thread_budget(kind)
+    return api_thread_budget()
+
+
+def configure_tensorflow_threads(kind: Optional[str] = None):
+    """
+    TensorFlow's pools are process-wide and fixed once the runtime starts,
+    so they are sized once per process (see tensorflow_thread_budget).
+    """
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(tensorflow_thread_budget(kind))
+    tf.config.threading.set_inter_op_parallelism_threads(settings.TF_INTER_OP_THREADS)
+
+
+def describe_thread_limits() -> dict:
+    """
+    Effective thread limits, for logging on startup.
+    """
+    import tensorflow as tf
+
+    return {
+        "api_threads": api_thread_budget() if _process_kind is None else None,
+        "train_threads": thread_budget("train"),
+        "predict_threads": thread_budget("predict"),
+        "tf_intra_op_threads": tf.config.threading.get_intra_op_parallelism_threads(),
+        "tf_inter_op_threads": tf.config.threading.get_inter_op_parallelism_threads(),
+        "native_pools": [
+            {"api": p["internal_api"], "num_threads": p["num_threads"]}
+            for p in threadpool_info()
+        ],
+    }
@@ -0,0 +1,208 @@
+import gzip
+import io
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+from typing import Any, Optional
+
+# Media types accepted (Content-Type) and produced (Accept) by the prediction endpoints
+JSON = "application/json"
+ARROW = "application/vnd.apache.arrow.stream"
+NPY = "application/x-npy"
+MSGPACK = "application/msgpack"
+
+_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    "application/octet-stream+npy": NPY,
+}
+
+_EXTENSIONS = {
+    ".arrow": ARROW,
+    ".arrows": ARROW,
+    ".npy": NPY,
+    ".msgpack": MSGPACK,
+    ".mpk": MSGPACK,
+}
+
+ARROW_FILE_MAGIC = b"ARROW1"  # leading bytes of the Arrow IPC file format (streams have none)
+MIN_COMPRESS_BYTES = 1024  # smaller bodies are not worth compressing
+
+
+def media_type(header: Optional[str]) -> str:
+    """
+    Normalize a Content-Type header value (parameters stripped, aliases resolved).
+    """
+    value = (header or JSON).split(";")[0].strip().lower()
+    return _ALIASES.get(value, value)
+
+
+def media_type_for_upload(content_type: Optional[str], filename: Optional[str]) -> Optional[str]:
+    """
+    Binary media type of an uploaded file, from its content type or extension.
+    Returns None for anything else (parsed as CSV).
+    """
+    value = media_type(content_type) if content_type else None
+    if value in (ARROW, NPY, MSGPACK):
+        return value
+    for ext, value in _EXTENSIONS.items():
+        if (filename or "").lower().endswith(ext):
+            return value
+    return None
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    Pick the response media type from an Accept header (JSON by default).
+    """
+    for part in (accept or "").split(","):
+        value = media_type(part)
+        if value in (ARROW, NPY, MSGPACK, JSON):
+            return value
+    return JSON
+
+
+def _require(module: str):
+    try:
+        return __import__(module)
+    except ImportError:
+        raise HTTPException(status_code=415, detail=f"This format requires the '{module}' package on the server.")
+
+
+def decode_array(body: bytes, kind: str) -> Any:
+    """
+    Decode a binary request body into a NumPy array (or a DataFrame for Arrow,
+    which carries column names).
+
+    - Arrow IPC stream or file (detected by the ARROW1 magic, e.g. a
+      `.arrow`/Feather v2 upload); columns become features.
+    - .npy: a 2D array, loaded without pickle.
+    - msgpack: {"shape": [n, m], "dtype": "float32", "data": <bytes>} or a 2D list.
+    """
+    try:
+        if kind == ARROW:
+            pa = _require("pyarrow")
+            import pyarrow.ipc  # noqa: F401
+
+            if body[:6] == ARROW_FILE_MAGIC:
+                table = pa.ipc.open_file(pa.py_buffer(body)).read_all()
+            else:
+                table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+            return table.to_pandas()
+
+        if kind == NPY:
+            array = np.load(io.BytesIO(body), allow_pickle=False)
+        elif kind == MSGPACK:
+            msgpack = _require("msgpack")
+            payload = msgpack.unpackb(body, raw=False)
+            if isinstance(payload, dict) and "data" in payload:
+                array = np.frombuffer(payload["data"], dtype=np.dtype(payload.get("dtype", "float64")))
+                array = array.reshape(payload["shape"])
+            else:
+                array = np.asarray(payload.get("input_data") if isinstance(payload, dict) else payload, dtype=np.float64)
+        else:
+            raise HTTPException(status_code=415, detail=f"Unsupported content type: {kind}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to decode {kind} body: {str(e)}")
+
+    if array.ndim != 2:
+        raise HTTPException(status_code=400, detail="Input must be a 2D array of feature rows.")
+    return array
+
+
+def encode_array(array: np.ndarray, kind: str) -> bytes:
+    """
+    Encode predictions or probabilities in the requested binary format.
+    """
+    if kind == NPY:
+        buffer = io.BytesIO()
+        np.save(buffer, array, allow_pickle=False)
+        return buffer.getvalue()
+
+    if kind == ARROW:
+        pa = _require("pyarrow")
+        import pyarrow.ipc  # noqa: F401
+
+        if array.ndim == 1:
+            table = pa.table({"prediction": array})
+        else:
+            table = pa.table({f"p_{i}": array[:, i] for i in range(array.shape[1])})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    if kind == MSGPACK:
+        msgpack = _require("msgpack")
+        array = np.ascontiguousarray(array)
+        return msgpack.packb({
+            "shape": list(array.shape),
+            "dtype": array.dtype.str,
+            "data": array.tobytes(),
+        })
+
+    raise HTTPException(status_code=406, detail=f"Unsupported response type: {kind}")
+
+
+def compress(body: bytes, accept_encoding: Optional[str]):
+    """
+    Compress a response body with zstd or gzip if the client accepts it.
+    Returns the (possibly) compressed body and the Content-Encoding to send.
+    """
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+
+    encodings = [e.split(";")[0].strip().lower() for e in (accept_encoding or "").split(",")]
+    if "zstd" in encodings:
+        try:
+            import zstandard
+            return zstandard.ZstdCompressor(level=3).compress(body), "zstd"
+        except ImportError:
+            pass
+    if "gzip" in encodings:
+        return gzip.compress(body, compresslevel=5), "gzip"
+    return body, None
+
+
+def json_response(content: Any, accept_encoding: Optional[str]) -> Response:
+    """
+    JSON response, compressed when large enough and the client accepts it.
+    """
+    response = JSONResponse(content=content)
+    body, encoding = compress(response.body, accept_encoding)
+    if encoding is None:
+        return response
+    return Response(content=body, media_type=JSON, headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+
+
+def prediction_response(
+    prediction: list,
+    return_proba: bool,
+    kind: str,
+    accept_encoding: Optional[str],
+    extra: dict,
+) -> Response:
+    """
+    Build the prediction response in the negotiated format. JSON keeps the
+    per-row layout the UI expects; binary formats carry a bare array with
+    the model name and row count in headers.
+    """
+    if kind == JSON:
+        content = {"file_name": extra.get("file_name")}
+        if return_proba:
+            content["probabilities"] = [{"index": i, "scores": row} for i, row in enumerate(prediction)]
+        else:
+            content["predictions"] = [{"index": i, "value": val} for i, val in enumerate(prediction)]
+        content.update({k: v for k, v in extra.items() if k != "file_name"})
+        return json_response(content, accept_encoding)
+
+    body, encoding = compress(encode_array(np.asarray(prediction), kind), accept_encoding)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if extra.get("file_name") is not None:
+        headers["X-Model-Name"] = str(extra["file_name"])
+    headers["X-Rows-Predicted"] = str(len(prediction))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=kind, headers=headers)